@@ -1,61 +1,89 @@
 from aiogram import Bot, Dispatcher
-from aiogram.types import FSInputFile
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 from aiogram.types import ErrorEvent
-# from aiogram.fsm.storage.redis import RedisStorage
 from handlers import handler_user, other_handlers
 from middleware.outer import FirstOuterMiddleware
+from middleware.metrics import ApiMetricsMiddleware, MetricsMiddleware
+from middleware.throttling import ThrottlingMiddleware
 from config_data.config import Config, load_config
-from database.models import async_main
+from config_data.log_config import setup_logging
+from database.models import async_main, init_engine
+from database.requests import warm_user_cache
+from database.fsm_storage import create_storage
+from services.delivery import lead_delivery
+from services.error_reporter import ErrorReporter
+from services.lifecycle import Lifecycle
+from services.webhook import run_webhook
+from services.metrics import start_metrics_server
 
 import asyncio
 import logging
-import traceback
 
 logger = logging.getLogger(__name__)
 
 
 # Функция конфигурирования и запуска бота
 async def main():
-    await async_main()
-    # Конфигурируем логирование
-    logging.basicConfig(
-        level=logging.INFO,
-        filename="py_log.log",
-        filemode='w',
-        format='%(filename)s:%(lineno)d #%(levelname)-8s '
-               '[%(asctime)s] - %(name)s - %(message)s')
+    # Загружаем конфиг в переменную config
+    config: Config = load_config()
+
+    # Конфигурируем логирование: запись в файл с ротацией выполняется в отдельном потоке
+    log_listener = setup_logging(config)
 
     # Выводим в консоль информацию о начале запуска бота
     logger.info('Бот запущен...')
 
-    # Загружаем конфиг в переменную config
-    config: Config = load_config()
+    init_engine(config.db.url)
+    await async_main()
+    await warm_user_cache()
 
     # Инициализируем бот и диспетчер
     bot = Bot(token=config.tg_bot.token, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
-    # storage = RedisStorage.from_url('redis://127.0.0.1:6379/3')
-    # dp = Dispatcher(storage=storage)
-    dp = Dispatcher()
+    # Хранилище FSM выбирается в конфиге (FSM_STORAGE): memory, sqlite или redis
+    # config передается обработчикам через диспетчер
+    dp = Dispatcher(storage=create_storage(config), config=config)
     # Регистрируем router в диспетчере
     dp.include_router(handler_user.router)
     dp.include_router(other_handlers.router)
+    # Ограничение частоты апдейтов от одного пользователя до фильтров, FSM и БД
+    throttling = ThrottlingMiddleware(limits={'start': config.throttling.start,
+                                              'message': config.throttling.message,
+                                              'media': config.throttling.media,
+                                              'callback': config.throttling.callback})
+    throttling.register(dp)
     dp.message.middleware(FirstOuterMiddleware())
+    # Метрики обработчиков и запросов к Bot API, эндпоинт /metrics на METRICS_HOST:METRICS_PORT
+    dp.message.middleware(MetricsMiddleware('message'))
+    dp.callback_query.middleware(MetricsMiddleware('callback_query'))
+    bot.session.middleware(ApiMetricsMiddleware())
+    metrics_runner = await start_metrics_server(config.metrics.host, config.metrics.port)
+    lead_delivery.set_limits(concurrency=config.delivery.concurrency,
+                             global_rate=config.delivery.global_rate,
+                             chat_rate=config.delivery.chat_rate,
+                             chat_burst=config.delivery.chat_burst)
+    # Ошибки отправляются в поддержку в фоне, повторы одной ошибки суммируются
+    error_reporter = ErrorReporter(chat_id=config.tg_bot.support_id)
+    # Запуск и остановка фоновой записи заявок, рассылки и отчетов об ошибках:
+    # при остановке незавершенное сохраняется и повторяется при следующем запуске
+    Lifecycle(config, error_reporter).register(dp)
+
     @dp.error()
     async def error_handler(event: ErrorEvent):
-        logger.critical("Критическая ошибка: %s", event.exception, exc_info=True)
-        await bot.send_message(chat_id=config.tg_bot.support_id,
-                               text=f'{event.exception}')
-        formatted_lines = traceback.format_exc()
-        text_file = open('error.txt', 'w')
-        text_file.write(str(formatted_lines))
-        text_file.close()
-        await bot.send_document(chat_id=config.tg_bot.support_id,
-                                document=FSInputFile('error.txt'))
-    # Пропускаем накопившиеся update и запускаем polling
-    await bot.delete_webhook(drop_pending_updates=True)
-    await dp.start_polling(bot)
+        logger.critical("Критическая ошибка: %s", event.exception, exc_info=event.exception)
+        error_reporter.report(event.exception)
+
+    try:
+        # Режим получения апдейтов выбирается в конфиге (BOT_MODE): polling или webhook
+        if config.webhook.mode == 'webhook':
+            await run_webhook(dp, bot, config)
+        else:
+            await bot.delete_webhook(drop_pending_updates=config.webhook.drop_pending_updates)
+            await dp.start_polling(bot)
+    finally:
+        if metrics_runner:
+            await metrics_runner.cleanup()
+        log_listener.stop()
 
 if __name__ == '__main__':
     asyncio.run(main())
@@ -1,26 +1,155 @@
 from dataclasses import dataclass
 from environs import Env
+from marshmallow.validate import Length, OneOf
 
 
-@dataclass
+@dataclass(frozen=True)
 class TgBot:
     token: str
-    admin_ids: str
+    admin_ids: frozenset[int]
     support_id: int
     support_username: str
 
 
-@dataclass
+@dataclass(frozen=True)
+class Database:
+    url: str
+
+
+@dataclass(frozen=True)
+class Storage:
+    backend: str
+    redis_url: str
+    ttl: int
+
+
+@dataclass(frozen=True)
+class Logging:
+    path: str
+    format: str
+    max_bytes: int
+    interval: int
+    backup_count: int
+
+
+@dataclass(frozen=True)
+class Webhook:
+    mode: str
+    base_url: str
+    path: str
+    secret: str
+    host: str
+    port: int
+    # сколько апдейтов вебхука обрабатывается одновременно; при заполнении новые запросы ждут
+    max_concurrency: int
+    drop_pending_updates: bool
+
+
+@dataclass(frozen=True)
+class Metrics:
+    host: str
+    port: int
+
+
+@dataclass(frozen=True)
+class Throttling:
+    start: tuple[float, float]
+    message: tuple[float, float]
+    media: tuple[float, float]
+    callback: tuple[float, float]
+    max_attachments: int
+
+
+@dataclass(frozen=True)
+class Delivery:
+    concurrency: int
+    global_rate: float
+    chat_rate: float
+    chat_burst: float
+    dedup_window: int
+
+
+@dataclass(frozen=True)
+class Lifecycle:
+    shutdown_timeout: float
+    pending_path: str
+
+
+@dataclass(frozen=True)
 class Config:
     tg_bot: TgBot
+    db: Database
+    storage: Storage
+    logging: Logging
+    webhook: Webhook
+    metrics: Metrics
+    throttling: Throttling
+    delivery: Delivery
+    lifecycle: Lifecycle
+
+
+def _limit(env: Env, name: str, default: list) -> tuple[float, float]:
+    # лимит в формате "скорость,серия": апдейтов в секунду и сколько можно подряд
+    return tuple(env.list(name, default, subcast=float, validate=Length(equal=2)))
 
 
 def load_config(path: str = None) -> Config:
+    """
+    Читаем и проверяем конфиг. Вызывается один раз при запуске, обработчики получают
+    готовый объект через диспетчер (аргумент config)
+    :param path:
+    :return:
+    """
     env = Env()
     env.read_env(path)
+    # серия медиа не меньше лимита вложений, иначе часть альбомов молча отбрасывалась бы
+    max_attachments = env.int('MAX_ATTACHMENTS', 30)
+    media_rate, media_burst = _limit(env, 'THROTTLE_MEDIA', [1, 30])
+    # в режиме webhook адрес и секретный токен обязательны
+    bot_mode = env('BOT_MODE', 'polling', validate=OneOf(['polling', 'webhook']))
+    webhook_required = {'validate': Length(min=1)} if bot_mode == 'webhook' else {'default': ''}
     return Config(tg_bot=TgBot(token=env('BOT_TOKEN'),
-                               admin_ids=env('ADMIN_IDS'),
-                               support_id=env('SUPPORT_ID'),
+                               admin_ids=frozenset(env.list('ADMIN_IDS', subcast=int)),
+                               support_id=env.int('SUPPORT_ID'),
                                support_username=env('SUPPORT_USERNAME')
-                               )
+                               ),
+                  db=Database(url=env('DATABASE_URL', 'sqlite+aiosqlite:///database/db.sqlite3')),
+                  storage=Storage(backend=env('FSM_STORAGE', 'memory',
+                                              validate=OneOf(['memory', 'sqlite', 'redis'])),
+                                  redis_url=env('REDIS_URL', 'redis://127.0.0.1:6379/3'),
+                                  ttl=env.int('FSM_TTL', 86400)
+                                  ),
+                  logging=Logging(path=env('LOG_FILE', 'py_log.log'),
+                                  format=env('LOG_FORMAT', 'text', validate=OneOf(['text', 'json'])),
+                                  max_bytes=env.int('LOG_MAX_BYTES', 10 * 1024 * 1024),
+                                  interval=env.int('LOG_ROTATE_INTERVAL', 86400),
+                                  backup_count=env.int('LOG_BACKUP_COUNT', 7)
+                                  ),
+                  webhook=Webhook(mode=bot_mode,
+                                  base_url=env('WEBHOOK_BASE_URL', **webhook_required),
+                                  path=env('WEBHOOK_PATH', '/webhook'),
+                                  secret=env('WEBHOOK_SECRET', **webhook_required),
+                                  host=env('WEBHOOK_HOST', '0.0.0.0'),
+                                  port=env.int('WEBHOOK_PORT', 8080),
+                                  max_concurrency=env.int('WEBHOOK_MAX_CONCURRENCY', 100),
+                                  drop_pending_updates=env.bool('DROP_PENDING_UPDATES', True)
+                                  ),
+                  metrics=Metrics(host=env('METRICS_HOST', '127.0.0.1'),
+                                  port=env.int('METRICS_PORT', 9101)
+                                  ),
+                  throttling=Throttling(start=_limit(env, 'THROTTLE_START', [0.2, 3]),
+                                        message=_limit(env, 'THROTTLE_MESSAGE', [1, 5]),
+                                        media=(media_rate, max(media_burst, max_attachments)),
+                                        callback=_limit(env, 'THROTTLE_CALLBACK', [2, 5]),
+                                        max_attachments=max_attachments
+                                        ),
+                  delivery=Delivery(concurrency=env.int('DELIVERY_CONCURRENCY', 4),
+                                    global_rate=env.float('DELIVERY_GLOBAL_RATE', 25),
+                                    chat_rate=env.float('DELIVERY_CHAT_RATE', 1),
+                                    chat_burst=env.float('DELIVERY_CHAT_BURST', 3),
+                                    dedup_window=env.int('LEAD_DEDUP_WINDOW', 3600)
+                                    ),
+                  lifecycle=Lifecycle(shutdown_timeout=env.float('SHUTDOWN_TIMEOUT', 20),
+                                      pending_path=env('PENDING_PATH', 'database/pending.json')
+                                      )
                   )
@@ -0,0 +1,101 @@
+import copy
+import gzip
+import json
+import logging
+import os
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from config_data.config import Config
+
+TEXT_FORMAT = '%(filename)s:%(lineno)d #%(levelname)-8s [%(asctime)s] - %(name)s - %(message)s'
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Одна запись лога - одна JSON-строка
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {'time': self.formatTime(record),
+                 'level': record.levelname,
+                 'logger': record.name,
+                 'where': f'{record.filename}:{record.lineno}',
+                 'message': record.getMessage()}
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class SizeTimeRotatingFileHandler(RotatingFileHandler):
+    """
+    Ротация лога по размеру файла и по времени (не реже чем раз в interval секунд)
+    """
+
+    def __init__(self, filename: str, max_bytes: int, interval: int, backup_count: int) -> None:
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        self.interval = interval
+        self.rollover_at = time.time() + interval
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if time.time() >= self.rollover_at:
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self) -> None:
+        super().doRollover()
+        self.rollover_at = time.time() + self.interval
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Кладет запись в очередь без форматирования: в потоке event loop только подставляем args,
+    текст записи и трейсбек форматирует обработчик в потоке QueueListener
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def setup_logging(config: Config, level: int = logging.INFO) -> QueueListener:
+    """
+    Обработчики пишут записи в очередь, в файл их пишет отдельный поток QueueListener
+    :param config:
+    :param level:
+    :return: запущенный QueueListener, его нужно остановить при завершении работы
+    """
+    file_handler = SizeTimeRotatingFileHandler(config.logging.path,
+                                               max_bytes=config.logging.max_bytes,
+                                               interval=config.logging.interval,
+                                               backup_count=config.logging.backup_count)
+    if config.logging.format == 'json':
+        file_handler.setFormatter(JsonFormatter())
+    else:
+        file_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(DeferredQueueHandler(log_queue))
+    listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def read_recent_log(path: str, max_bytes: int = 1024 * 1024) -> bytes:
+    """
+    Последние max_bytes байт лога, сжатые gzip (вызывать в отдельном потоке)
+    :param path:
+    :param max_bytes:
+    :return:
+    """
+    with open(path, 'rb') as file:
+        file.seek(max(os.path.getsize(path) - max_bytes, 0))
+        data = file.read()
+    # начинаем с целой строки
+    if len(data) == max_bytes and b'\n' in data:
+        data = data[data.index(b'\n') + 1:]
+    return gzip.compress(data)
@@ -0,0 +1,41 @@
+import time
+from collections import OrderedDict
+from typing import Hashable
+
+
+class KeyCache:
+    """
+    Ограниченный LRU-кэш ключей с временем жизни и счетчиками попаданий/промахов
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._items: OrderedDict[Hashable, float] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def contains(self, key: Hashable) -> bool:
+        """
+        Проверяем наличие ключа, учитываем попадание или промах
+        :param key:
+        :return:
+        """
+        expires = self._items.get(key)
+        if expires is not None and expires > time.monotonic():
+            self._items.move_to_end(key)
+            self.hits += 1
+            return True
+        if expires is not None:
+            del self._items[key]
+        self.misses += 1
+        return False
+
+    def add(self, key: Hashable) -> None:
+        self._items[key] = time.monotonic() + self.ttl
+        self._items.move_to_end(key)
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
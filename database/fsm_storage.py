@@ -0,0 +1,127 @@
+import json
+import logging
+import time
+from functools import partial
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from sqlalchemy import case, delete, select
+from sqlalchemy.dialects.sqlite import insert
+
+from config_data.config import Config
+from database.models import FSMRecord, async_session
+from services.metrics import FSM_STORAGE_SECONDS
+
+# компактная сериализация данных FSM
+json_dumps = partial(json.dumps, ensure_ascii=False, separators=(',', ':'))
+
+# как часто удалять просроченные анкеты, сек
+PURGE_INTERVAL = 600
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    Хранилище FSM в таблице fsm_storage, данные живут ttl секунд с последнего изменения
+    """
+
+    def __init__(self, ttl: int) -> None:
+        self.ttl = ttl
+        self._purged_at = 0.0
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        return (f'{key.bot_id}:{key.chat_id}:{key.user_id}:{key.thread_id}:'
+                f'{key.business_connection_id}:{key.destiny}')
+
+    async def _upsert(self, key: StorageKey, **values: Any) -> None:
+        now = time.time()
+        values['expires_at'] = now + self.ttl
+        stmt = insert(FSMRecord).values(key=self._key(key), **values)
+        # если запись уже просрочена, вторую колонку (state или data) очищаем,
+        # иначе продление expires_at вернуло бы брошенную анкету
+        set_ = dict(values)
+        for column in (FSMRecord.state, FSMRecord.data):
+            if column.key not in set_:
+                set_[column.key] = case((FSMRecord.expires_at < now, None), else_=column)
+        stmt = stmt.on_conflict_do_update(index_elements=[FSMRecord.key], set_=set_)
+        async with async_session() as session:
+            await session.execute(stmt)
+            if now - self._purged_at > PURGE_INTERVAL:
+                self._purged_at = now
+                await session.execute(delete(FSMRecord).where(FSMRecord.expires_at < now))
+            await session.commit()
+
+    async def _get(self, key: StorageKey, column) -> Optional[str]:
+        async with async_session() as session:
+            return await session.scalar(select(column).where(FSMRecord.key == self._key(key),
+                                                             FSMRecord.expires_at > time.time()))
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self._upsert(key, state=state.state if isinstance(state, State) else state)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return await self._get(key, FSMRecord.state)
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        await self._upsert(key, data=json_dumps(data) if data else None)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        data = await self._get(key, FSMRecord.data)
+        return json.loads(data) if data else {}
+
+    async def close(self) -> None:
+        pass
+
+
+class TimedStorage(BaseStorage):
+    """
+    Обертка над хранилищем FSM, замеряющая время операций
+    """
+
+    def __init__(self, storage: BaseStorage) -> None:
+        self.storage = storage
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        with FSM_STORAGE_SECONDS.time('set_state'):
+            await self.storage.set_state(key, state)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        with FSM_STORAGE_SECONDS.time('get_state'):
+            return await self.storage.get_state(key)
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        with FSM_STORAGE_SECONDS.time('set_data'):
+            await self.storage.set_data(key, data)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        with FSM_STORAGE_SECONDS.time('get_data'):
+            return await self.storage.get_data(key)
+
+    async def close(self) -> None:
+        await self.storage.close()
+
+
+def create_storage(config: Config) -> BaseStorage:
+    """
+    Создаем хранилище FSM по настройке FSM_STORAGE: memory, sqlite или redis
+    :param config:
+    :return:
+    """
+    backend = config.storage.backend
+    logging.info('create_storage %s', backend)
+    if backend == 'memory':
+        storage = MemoryStorage()
+    elif backend == 'sqlite':
+        storage = SQLiteStorage(ttl=config.storage.ttl)
+    elif backend == 'redis':
+        # redis - необязательная зависимость, нужна только для этого режима
+        from aiogram.fsm.storage.redis import RedisStorage
+        storage = RedisStorage.from_url(config.storage.redis_url,
+                                        state_ttl=config.storage.ttl,
+                                        data_ttl=config.storage.ttl,
+                                        json_dumps=json_dumps)
+    else:
+        raise ValueError(f'Unknown FSM_STORAGE: {backend}')
+    return TimedStorage(storage)
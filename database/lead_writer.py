@@ -0,0 +1,132 @@
+import asyncio
+import logging
+from collections import Counter
+from typing import Callable, Optional
+
+import database.requests as rq
+
+
+class LeadWriter:
+    """
+    Отложенная запись заявок в БД: заявки копятся в очереди и сохраняются пачкой
+    каждые batch_size заявок или interval секунд
+    """
+
+    def __init__(self, batch_size: int = 50, interval: float = 0.5) -> None:
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue: asyncio.Queue[Optional[dict]] = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        # пачка, которая сейчас записывается, и заявки, которые записать не удалось
+        self._batch: list[dict] = []
+        self._failed: list[dict] = []
+        # после начала остановки заявки не ставятся в очередь, а сразу передаются в spill
+        self._stopping = False
+        self.spill: Optional[Callable[[list[dict]], None]] = None
+
+    async def start(self) -> None:
+        self._stopping = False
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def put(self, lead: dict) -> None:
+        """
+        Ставим заявку в очередь на запись, не дожидаясь БД
+        :param lead:
+        :return:
+        """
+        if self._stopping:
+            self._spill([lead])
+            return
+        self._queue.put_nowait(lead)
+
+    def add_repeat(self, fingerprint: str) -> None:
+        """
+        Ставим в очередь повтор заявки: он записывается после самой заявки, даже если она еще
+        не сохранена в БД
+        :param fingerprint:
+        :return:
+        """
+        self.put({'repeat_of': fingerprint, 'repeats': 1})
+
+    def _spill(self, leads: list[dict]) -> None:
+        if self.spill is None:
+            logging.error('LeadWriter: %s leads received after stop are lost', len(leads))
+            return
+        self.spill(leads)
+
+    async def stop(self, timeout: Optional[float] = None) -> list[dict]:
+        """
+        Дописываем заявки из очереди не дольше timeout секунд и останавливаем запись
+        :param timeout:
+        :return: заявки, которые не удалось записать
+        """
+        self._stopping = True
+        if self._task is not None:
+            self._queue.put_nowait(None)
+            try:
+                await asyncio.wait_for(asyncio.shield(self._task), timeout)
+            except asyncio.TimeoutError:
+                self._task.cancel()
+                await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        unfinished = self._failed + self._batch
+        self._failed, self._batch = [], []
+        while not self._queue.empty():
+            lead = self._queue.get_nowait()
+            if lead is not None:
+                unfinished.append(lead)
+        return unfinished
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopped = False
+        while not stopped:
+            lead = await self._queue.get()
+            if lead is None:
+                break
+            batch = self._batch = [lead]
+            deadline = loop.time() + self.interval
+            while len(batch) < self.batch_size:
+                try:
+                    lead = await asyncio.wait_for(self._queue.get(), deadline - loop.time())
+                except asyncio.TimeoutError:
+                    break
+                if lead is None:
+                    stopped = True
+                    break
+                batch.append(lead)
+            leads, repeats = self._merge_repeats(batch)
+            # повторы уже прибавлены к заявкам, в незаписанное попадает пачка после объединения
+            self._batch = leads + [{'repeat_of': fingerprint, 'repeats': count}
+                                   for fingerprint, count in repeats.items()]
+            try:
+                await rq.add_leads(leads, repeats)
+            except Exception:
+                logging.exception('LeadWriter: %s leads not saved', len(leads))
+                self._failed.extend(self._batch)
+            self._batch = []
+
+    def _merge_repeats(self, batch: list[dict]) -> tuple[list[dict], Counter]:
+        """
+        Повтор заявки, которая еще не записана в БД (в этой пачке или в незаписанных),
+        прибавляем к ней самой, остальные повторы считаем по отпечаткам
+        :param batch:
+        :return: заявки и отпечаток -> количество повторов для заявок, уже записанных в БД
+        """
+        unsaved = {lead.get('fingerprint'): lead for lead in self._failed if 'repeat_of' not in lead}
+        leads, repeats = [], Counter()
+        for item in batch:
+            fingerprint = item.get('repeat_of')
+            if fingerprint is None:
+                leads.append(item)
+                unsaved[item.get('fingerprint')] = item
+            elif fingerprint in unsaved:
+                lead = unsaved[fingerprint]
+                lead['repeats'] = lead.get('repeats', 0) + item['repeats']
+            else:
+                repeats[fingerprint] += item['repeats']
+        return leads, repeats
+
+
+lead_writer = LeadWriter()
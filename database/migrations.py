@@ -0,0 +1,96 @@
+import logging
+from typing import Awaitable, Callable
+
+from sqlalchemy import inspect, text
+
+from filter.filter import normalize_phones
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+Migration = Callable[[AsyncConnection], Awaitable[None]]
+
+# версия схемы -> функция миграции, применяются по возрастанию версии
+MIGRATIONS: dict[int, Migration] = {}
+
+
+def migration(version: int) -> Callable[[Migration], Migration]:
+    def register(func: Migration) -> Migration:
+        MIGRATIONS[version] = func
+        return func
+    return register
+
+
+@migration(1)
+async def users_unique_tg_id(conn: AsyncConnection) -> None:
+    """
+    Удаляем дубли пользователей (оставляем самую раннюю запись), добавляем уникальный индекс
+    по tg_id и расширяем колонки tg_id и username
+    :param conn:
+    :return:
+    """
+    await conn.execute(text('DELETE FROM users WHERE tg_id IS NOT NULL AND id NOT IN '
+                            '(SELECT MIN(id) FROM users WHERE tg_id IS NOT NULL GROUP BY tg_id)'))
+    await conn.execute(text('CREATE UNIQUE INDEX IF NOT EXISTS ix_users_tg_id ON users (tg_id)'))
+    # SQLite не ограничивает размер INTEGER и VARCHAR, для остальных СУБД меняем тип колонок
+    if conn.dialect.name != 'sqlite':
+        await conn.execute(text('ALTER TABLE users ALTER COLUMN tg_id TYPE BIGINT'))
+        await conn.execute(text('ALTER TABLE users ALTER COLUMN username TYPE VARCHAR(64)'))
+
+
+@migration(2)
+async def leads_e164_phones(conn: AsyncConnection) -> None:
+    """
+    Приводим сохраненные номера телефонов заявок к формату E.164
+    :param conn:
+    :return:
+    """
+    rows = (await conn.execute(text('SELECT id, phone FROM leads'))).all()
+    checks = normalize_phones(phone for _, phone in rows)
+    params = [{'id': lead_id, 'phone': check.phone}
+              for (lead_id, phone), check in zip(rows, checks) if check.phone and check.phone != phone]
+    if params:
+        await conn.execute(text('UPDATE leads SET phone = :phone WHERE id = :id'), params)
+
+
+@migration(3)
+async def leads_fingerprint(conn: AsyncConnection) -> None:
+    """
+    Колонки для поиска повторных заявок (в новой БД их уже создал create_all)
+    :param conn:
+    :return:
+    """
+    columns = await conn.run_sync(lambda sync_conn: {column['name'] for column in
+                                                     inspect(sync_conn).get_columns('leads')})
+    if 'fingerprint' not in columns:
+        await conn.execute(text('ALTER TABLE leads ADD COLUMN fingerprint VARCHAR(64)'))
+    if 'repeats' not in columns:
+        await conn.execute(text("ALTER TABLE leads ADD COLUMN repeats INTEGER NOT NULL DEFAULT '0'"))
+    await conn.execute(text('CREATE INDEX IF NOT EXISTS ix_leads_fingerprint ON leads (fingerprint)'))
+
+
+def _has_unique_tg_id(sync_conn) -> bool:
+    # уникальный индекс или ограничение UNIQUE по одной колонке tg_id
+    inspector = inspect(sync_conn)
+    indexes = [index['column_names'] for index in inspector.get_indexes('users') if index['unique']]
+    constraints = [constraint['column_names'] for constraint in inspector.get_unique_constraints('users')]
+    return ['tg_id'] in indexes + constraints
+
+
+async def migrate(conn: AsyncConnection) -> None:
+    """
+    Применяем миграции, которых еще нет в таблице schema_version
+    :param conn:
+    :return:
+    """
+    await conn.execute(text('CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)'))
+    current = await conn.scalar(text('SELECT MAX(version) FROM schema_version')) or 0
+    for version in sorted(MIGRATIONS):
+        if version <= current:
+            continue
+        logging.info('migrate: schema version %s', version)
+        await MIGRATIONS[version](conn)
+        await conn.execute(text('INSERT INTO schema_version (version) VALUES (:version)'),
+                           {'version': version})
+    # add_user полагается на ON CONFLICT по tg_id: без уникального индекса дубли пользователей
+    # добавлялись бы молча, поэтому такую схему не запускаем
+    if not await conn.run_sync(_has_unique_tg_id):
+        raise RuntimeError('users.tg_id has no unique index, add_user upsert would insert duplicates')
@@ -4,10 +4,23 @@ from sqlalchemy.ext.asyncio import AsyncAttrs, async_sessionmaker, create_async_
 
 from typing import List
 
+from database.migrations import migrate
+
 engine = create_async_engine(url="sqlite+aiosqlite:///database/db.sqlite3", echo=False)
 async_session = async_sessionmaker(engine)
 
 
+def init_engine(url: str) -> None:
+    """
+    Подключаемся к БД из конфига (DATABASE_URL), async_session начинает работать с ней
+    :param url:
+    :return:
+    """
+    global engine
+    engine = create_async_engine(url=url, echo=False)
+    async_session.configure(bind=engine)
+
+
 class Base(AsyncAttrs, DeclarativeBase):
     pass
 
@@ -16,13 +29,52 @@ class User(Base):
     __tablename__ = 'users'
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    tg_id = mapped_column(Integer)
-    username: Mapped[str] = mapped_column(String(20))
+    tg_id = mapped_column(BigInteger, unique=True, index=True)
+    username: Mapped[str] = mapped_column(String(64))
+
+
+class Lead(Base):
+    __tablename__ = 'leads'
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    tg_id = mapped_column(BigInteger, index=True)
+    username: Mapped[str] = mapped_column(String(64), nullable=True)
+    action: Mapped[str] = mapped_column(String(10))
+    name: Mapped[str] = mapped_column(String(128))
+    phone: Mapped[str] = mapped_column(String(32))
+    request_user: Mapped[str] = mapped_column(String)
+    created_at: Mapped[float] = mapped_column(Float)
+    # отпечаток заявки для поиска повторов и число объединенных с ней повторных заявок
+    fingerprint: Mapped[str] = mapped_column(String(64), nullable=True, index=True)
+    repeats: Mapped[int] = mapped_column(Integer, default=0, server_default='0')
+    attachments: Mapped[List['LeadAttachment']] = relationship(back_populates='lead')
+
+
+class LeadAttachment(Base):
+    __tablename__ = 'lead_attachments'
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    lead_id: Mapped[int] = mapped_column(ForeignKey('leads.id'), index=True)
+    kind: Mapped[str] = mapped_column(String(10))
+    file_id: Mapped[str] = mapped_column(String)
+    file_unique_id: Mapped[str] = mapped_column(String(64))
+    caption: Mapped[str] = mapped_column(String, nullable=True)
+    lead: Mapped['Lead'] = relationship(back_populates='attachments')
+
+
+class FSMRecord(Base):
+    __tablename__ = 'fsm_storage'
+
+    key: Mapped[str] = mapped_column(String(128), primary_key=True)
+    state: Mapped[str] = mapped_column(String(128), nullable=True)
+    data: Mapped[str] = mapped_column(String, nullable=True)
+    expires_at: Mapped[float] = mapped_column(Float, index=True)
 
 
 async def async_main():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await migrate(conn)
 
 # import asyncio
 #
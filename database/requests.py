@@ -1,9 +1,28 @@
-from database.models import User
+from database.models import User, Lead, LeadAttachment
 from database.models import async_session
-from sqlalchemy import select
+from database.cache import KeyCache
+from sqlalchemy import Row, func, select, update
+from sqlalchemy import insert as bulk_insert
+from sqlalchemy.dialects.sqlite import insert
+from services.metrics import Counter, DB_QUERY_SECONDS, collectors, db_timed
+from typing import AsyncIterator, Optional
 import logging
 
 
+# tg_id пользователей, которые уже есть в БД
+known_users = KeyCache(maxsize=100_000, ttl=6 * 3600)
+
+USER_CACHE = Counter('bot_user_cache_total', 'Known users cache lookups', ('result',))
+
+
+def collect_user_cache() -> None:
+    USER_CACHE.values[('hit',)] = known_users.hits
+    USER_CACHE.values[('miss',)] = known_users.misses
+
+
+collectors.append(collect_user_cache)
+
+
 """USER"""
 
 
@@ -14,21 +33,124 @@ async def add_user(tg_id: int, data: dict) -> None:
     :param data:
     :return:
     """
-    logging.info(f'add_user')
-    async with async_session() as session:
-        user = await session.scalar(select(User).where(User.tg_id == tg_id))
-        # если пользователя нет в базе
-        if not user:
-            session.add(User(**data))
+    if known_users.contains(tg_id):
+        return
+    logging.info('add_user')
+    # замеряем только запрос к БД, попадания в кэш не искажают время запросов
+    with DB_QUERY_SECONDS.time('add_user'):
+        async with async_session() as session:
+            # если пользователь уже есть в базе, уникальный индекс по tg_id не даст добавить дубль
+            await session.execute(insert(User).values(**data).on_conflict_do_nothing(index_elements=[User.tg_id]))
             await session.commit()
+    known_users.add(tg_id)
 
 
+@db_timed
+async def warm_user_cache() -> None:
+    """
+    Заполняем кэш known_users пользователями из БД при запуске
+    :return:
+    """
+    async with async_session() as session:
+        tg_ids = await session.scalars(select(User.tg_id).order_by(User.id.desc()).limit(known_users.maxsize))
+        # самые свежие пользователи добавляются последними и дольше остаются в LRU
+        for tg_id in reversed(tg_ids.all()):
+            known_users.add(tg_id)
+    logging.info('warm_user_cache: %s', len(known_users))
+
+
+@db_timed
 async def get_all_users() -> list[User]:
     """
     Получаем список всех пользователей зарегистрированных в боте
     :return:
     """
-    logging.info(f'get_all_users')
+    logging.info('get_all_users')
     async with async_session() as session:
         users = await session.scalars(select(User))
-        return users
\ No newline at end of file
+        return users.all()
+
+
+@db_timed
+async def count_users() -> int:
+    """
+    Количество пользователей зарегистрированных в боте
+    :return:
+    """
+    async with async_session() as session:
+        return await session.scalar(select(func.count(User.id)))
+
+
+async def iter_users(batch_size: int = 1000) -> AsyncIterator[Row]:
+    """
+    Постранично (keyset по id) перебираем пользователей, не загружая всю таблицу в память
+    :param batch_size:
+    :return: строки (id, tg_id, username)
+    """
+    logging.info('iter_users')
+    last_id = 0
+    while True:
+        with DB_QUERY_SECONDS.time('iter_users'):
+            async with async_session() as session:
+                result = await session.execute(select(User.id, User.tg_id, User.username)
+                                               .where(User.id > last_id)
+                                               .order_by(User.id)
+                                               .limit(batch_size))
+                rows = result.all()
+        if not rows:
+            return
+        for row in rows:
+            yield row
+        last_id = rows[-1].id
+
+
+"""LEAD"""
+
+
+@db_timed
+async def add_leads(leads: list[dict], repeats: Optional[dict[str, int]] = None) -> None:
+    """
+    Сохраняем пачку заявок и их вложений одной транзакцией
+    :param leads: словари с полями Lead и списком записей вложений в ключе content
+    :param repeats: отпечаток -> сколько повторов прибавить к последней заявке с этим отпечатком
+    :return:
+    """
+    logging.info('add_leads %s', len(leads))
+    async with async_session() as session:
+        async with session.begin():
+            if leads:
+                lead_ids = await session.scalars(
+                    bulk_insert(Lead).returning(Lead.id, sort_by_parameter_order=True),
+                    [{**{key: value for key, value in lead.items() if key != 'content'},
+                      'repeats': lead.get('repeats', 0)} for lead in leads])
+                attachments = [{'lead_id': lead_id,
+                                'kind': kind,
+                                'file_id': file_id,
+                                'file_unique_id': file_unique_id,
+                                'caption': caption}
+                               for lead_id, lead in zip(lead_ids.all(), leads)
+                               for kind, file_id, file_unique_id, caption in lead['content']]
+                if attachments:
+                    await session.execute(bulk_insert(LeadAttachment), attachments)
+            # повторные заявки объединяем с последней заявкой с тем же отпечатком
+            for fingerprint, count in (repeats or {}).items():
+                last_id = select(func.max(Lead.id)).where(Lead.fingerprint == fingerprint).scalar_subquery()
+                result = await session.execute(update(Lead).where(Lead.id == last_id)
+                                               .values(repeats=Lead.repeats + count))
+                if not result.rowcount:
+                    logging.warning('add_leads: no lead for repeat %s', fingerprint)
+
+
+@db_timed
+async def has_recent_lead(fingerprint: str, since: float) -> bool:
+    """
+    Есть ли заявка с таким отпечатком, созданная не раньше since
+    :param fingerprint:
+    :param since:
+    :return:
+    """
+    async with async_session() as session:
+        lead_id = await session.scalar(select(Lead.id)
+                                       .where(Lead.fingerprint == fingerprint, Lead.created_at >= since)
+                                       .limit(1))
+        return lead_id is not None
@@ -1,12 +1,53 @@
-import re
+from typing import Iterable, NamedTuple, Optional
 
 
-def validate_russian_phone_number(phone_number):
-    # Паттерн для российских номеров телефона
-    # Российские номера могут начинаться с +7, 8, или без кода страны
-    pattern = re.compile(r'^(\+7|8|7)?(\d{10})$')
+class PhoneCheck(NamedTuple):
+    # номер в формате E.164 (+79991234567) или None, если номер не прошел проверку
+    phone: Optional[str]
+    # причина отказа: empty, chars или length
+    reason: Optional[str] = None
+
+
+PHONE_EMPTY = PhoneCheck(None, 'empty')
+PHONE_CHARS = PhoneCheck(None, 'chars')
+PHONE_LENGTH = PhoneCheck(None, 'length')
+
 
-    # Проверка соответствия паттерну
-    match = pattern.match(phone_number)
+def normalize_russian_phone_number(phone_number: Optional[str]) -> PhoneCheck:
+    """
+    Проверяем российский номер телефона и приводим его к формату E.164.
+    Российские номера могут начинаться с +7, 8, 7 или без кода страны, далее 10 цифр
+    :param phone_number:
+    :return:
+    """
+    if not phone_number:
+        return PHONE_EMPTY
+    # номер с разделителями: +7 (999) 123-45-67, убираем пробелы, скобки, дефисы и точки за один проход
+    # по строке на каждый разделитель; номера без разделителей (+79991234567) эту обработку пропускают
+    if not phone_number[1:].isdigit():
+        phone_number = ''.join(phone_number.split()).replace('(', '').replace(')', '').replace('-', '').replace('.', '')
+    has_plus = phone_number[:1] == '+'
+    digits = phone_number[1:] if has_plus else phone_number
+    if not digits:
+        return PHONE_EMPTY
+    if not (digits.isascii() and digits.isdigit()):
+        return PHONE_CHARS
+    size = len(digits)
+    if size == 10 and not has_plus:
+        return PhoneCheck('+7' + digits)
+    if size == 11 and (digits[0] == '7' or (digits[0] == '8' and not has_plus)):
+        return PhoneCheck('+7' + digits[1:])
+    return PHONE_LENGTH
 
-    return bool(match)
\ No newline at end of file
+
+def normalize_phones(phone_numbers: Iterable[Optional[str]]) -> list[PhoneCheck]:
+    """
+    Пакетная нормализация номеров, например уже сохраненных в БД
+    :param phone_numbers:
+    :return:
+    """
+    return [normalize_russian_phone_number(phone_number) for phone_number in phone_numbers]
+
+
+def validate_russian_phone_number(phone_number):
+    return normalize_russian_phone_number(phone_number).phone is not None
@@ -4,17 +4,21 @@ from aiogram.filters import CommandStart, StateFilter, or_f
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
-from config_data.config import Config, load_config
+from config_data.config import Config
 import database.requests as rq
+from database.lead_writer import lead_writer
 import keyboards.keyboard_user as kb
-from filter.filter import validate_russian_phone_number
+from lexicon.lexicon import render
+from filter.filter import normalize_russian_phone_number
+from services.album import album_aggregator
+from services.content import ContentItem
+from services.delivery import lead_delivery
+from services.lead_dedup import lead_dedup, lead_fingerprint
 
 import logging
-import asyncio
-import random
+import time
 
 router = Router()
-config: Config = load_config()
 
 
 class User(StatesGroup):
@@ -33,7 +37,7 @@ async def process_start_command(message: Message, state: FSMContext, bot: Bot) -
     :param bot:
     :return:
     """
-    logging.info(f"process_start_command {message.chat.id}")
+    logging.info("process_start_command %s", message.chat.id)
     await state.set_state(state=None)
     if message.from_user.username == None:
         username = 'None'
@@ -41,8 +45,7 @@ async def process_start_command(message: Message, state: FSMContext, bot: Bot) -
         username = message.from_user.username
     await rq.add_user(tg_id=message.chat.id,
                       data={"tg_id": message.chat.id, "username": username})
-    await message.answer(text=f'🤖 Добрый день, мы рады вас видеть.\n'
-                              f'Хотите продать или купить автомобиль?',
+    await message.answer(text=render('start'),
                          reply_markup=kb.keyboard_action())
 
 
@@ -55,17 +58,15 @@ async def process_registration(callback: CallbackQuery, state: FSMContext):
     :param bot:
     :return:
     """
-    logging.info(f"process_registration {callback.message.chat.id}")
+    logging.info("process_registration %s", callback.message.chat.id)
     answer = callback.data.split('_')[1]
     await state.update_data(action=answer)
     if answer == 'sell':
-        await callback.message.edit_text(text="🤖 Хорошо, сейчас оценим, а пока давайте познакомимся.\n"
-                                              "Как вас зовут?",
+        await callback.message.edit_text(text=render('ask_name_sell'),
                                          reply_markup=None)
         await state.set_state(User.name)
     elif answer == "bay":
-        await callback.message.edit_text(text="🤖 Хорошо. Давайте познакомимся.\n"
-                                              "Как вас зовут?",
+        await callback.message.edit_text(text=render('ask_name_bay'),
                                          reply_markup=None)
         await state.set_state(User.name)
     await callback.answer()
@@ -80,10 +81,9 @@ async def get_name(message: Message, state: FSMContext, bot: Bot) -> None:
     :param bot:
     :return:
     """
-    logging.info(f'get_name {message.chat.id}')
+    logging.info('get_name %s', message.chat.id)
     await state.update_data(name=message.text)
-    await message.answer(text='Укажите ваш номер телефона или нажмите внизу 👇\n'
-                              '"Отправить свой контакт ☎️"',
+    await message.answer(text=render('ask_phone'),
                          reply_markup=kb.keyboards_get_contact())
     await state.set_state(User.phone)
 
@@ -96,28 +96,29 @@ async def get_phone_user(message: Message, state: FSMContext) -> None:
     :param state:
     :return:
     """
-    logging.info(f'get_phone_user: {message.chat.id}')
+    logging.info('get_phone_user: %s', message.chat.id)
     # если номер телефона отправлен через кнопку "Поделится"
     if message.contact:
         phone = str(message.contact.phone_number)
+        # Telegram передает номер контакта в международном формате, иностранные номера сохраняем как есть
+        phone = normalize_russian_phone_number(phone).phone or '+' + phone.lstrip('+')
     # если введен в поле ввода
     else:
-        phone = message.text
+        check = normalize_russian_phone_number(message.text)
         # проверка валидности отправленного номера телефона, если не валиден просим ввести его повторно
-        if not validate_russian_phone_number(phone):
-            await message.answer(text="Неверный формат номера, повторите ввод.")
+        if check.phone is None:
+            await message.answer(text=render(f'wrong_phone_{check.reason}'))
             return
-    # обновляем поле номера телефона
+        phone = check.phone
+    # обновляем поле номера телефона (в формате E.164)
     await state.update_data(phone=phone)
     data = await state.get_data()
     action = data['action']
     if action == 'bay':
-        await message.answer(text=f'🤖 Очень приятно, {data["name"]}. '
-                                  f'Опишите параметры интересующего автомобиля - марка, модель, бюджет.',
+        await message.answer(text=render('ask_request_bay', name=data['name']),
                              reply_markup=ReplyKeyboardRemove())
     elif action == 'sell':
-        await message.answer(text=f'🤖 Очень приятно, {data["name"]}. '
-                                  f'Какой у вас автомобиль? Марка, год, пробег, пожелание по цене',
+        await message.answer(text=render('ask_request_sell', name=data['name']),
                              reply_markup=ReplyKeyboardRemove())
     await state.set_state(User.request_user)
 
@@ -131,8 +132,8 @@ async def get_request_user(message: Message, state: FSMContext, bot: Bot) -> Non
     :param bot:
     :return:
     """
-    logging.info(f'get_request_user {message.chat.id}')
-    await message.answer(text='📎 Прикрепите фото (можно несколько), видео или документ.')
+    logging.info('get_request_user %s', message.chat.id)
+    await message.answer(text=render('ask_content'))
     await state.set_state(User.content_state)
     await state.update_data(content=[])
     await state.update_data(count=[])
@@ -140,66 +141,59 @@ async def get_request_user(message: Message, state: FSMContext, bot: Bot) -> Non
 
 
 @router.message(StateFilter(User.content_state), or_f(F.document, F.photo, F.video))
-async def request_content_photo_text(message: Message, state: FSMContext):
+async def request_content_photo_text(message: Message, state: FSMContext, config: Config):
     """
     Получаем от пользователя контент для публикации
     :param message:
     :param state:
     :return:
     """
-    logging.info(f'request_content_photo_text {message.chat.id}')
-    await asyncio.sleep(random.random())
-    data = await state.get_data()
-    list_content = data.get('content', [])
-    count = data.get('count', [])
+    logging.info('request_content_photo_text %s', message.chat.id)
     if message.text:
-        await message.answer(text=f'📎 Прикрепите фото (можно несколько), видео или документ.')
+        await message.answer(text=render('ask_content'))
         return
-    elif message.photo:
-        content = message.photo[-1].file_id
-        if message.caption:
-            caption = message.caption
-        else:
-            caption = 'None'
-        await state.update_data(caption=caption)
-
-    elif message.video:
-        content = message.video.file_id
-        if message.caption:
-            caption = message.caption
-        else:
-            caption = 'None'
-        await state.update_data(caption=caption)
-
-    elif message.document:
-        content = message.document.file_id
-        if message.caption:
-            caption = message.caption
-        else:
-            caption = 'None'
-        await state.update_data(caption=caption)
-
-    list_content.append(content)
-    count.append(content)
-    await state.update_data(content=list_content)
-    await state.update_data(count=count)
-    await state.set_state(state=None)
-    if len(count) == 1:
-        await message.answer(text='Добавить еще материал или отправить?',
+    # тип вложения фиксируем сразу, чтобы при рассылке не подбирать метод отправки
+    content = ContentItem.from_message(message)
+    # части альбома собираем вместе и записываем в FSM одним обновлением
+    if message.media_group_id:
+        list_new = await album_aggregator.collect((message.chat.id, message.media_group_id),
+                                                  message.message_id, content)
+        if list_new is None:
+            return
+    else:
+        list_new = [content]
+    async with album_aggregator.user_lock(message.chat.id):
+        data = await state.get_data()
+        list_content = data.get('content', [])
+        count = data.get('count', [])
+        # ограничиваем количество вложений в одной заявке
+        free = max(config.throttling.max_attachments - len(list_content), 0)
+        if len(list_new) > free:
+            await message.answer(text=render('attachments_limit', limit=config.throttling.max_attachments))
+            list_new = list_new[:free]
+        await state.set_data({**data,
+                              'content': list_content + list_new,
+                              'count': count + list_new})
+        await state.set_state(state=None)
+    if not count:
+        await message.answer(text=render('add_or_send'),
                              reply_markup=kb.keyboard_send())
 
 
 @router.callback_query(F.data.endswith('content'))
-async def send_add_content(callback: CallbackQuery, state: FSMContext, bot: Bot):
-    logging.info(f'send_add_content {callback.message.chat.id}')
+async def send_add_content(callback: CallbackQuery, state: FSMContext, bot: Bot, config: Config):
+    logging.info('send_add_content %s', callback.message.chat.id)
     answer = callback.data.split('_')[0]
     if answer == 'add':
         await state.set_state(User.content_state)
         await state.update_data(count=[])
-        await callback.message.edit_text(text='📎 Прикрепите фото (можно несколько), видео или документ.')
+        await callback.message.edit_text(text=render('ask_content'))
     else:
-        await callback.message.edit_text(text='Материалы от вас переданы\n\n'
-                                              'Спасибо! С вами свяжутся',
+        # повторное нажатие "Отправить" в том же сообщении не создает новую заявку
+        if not lead_dedup.claim_submit(callback.message.chat.id, callback.message.message_id):
+            await callback.answer()
+            return
+        await callback.message.edit_text(text=render('content_sent'),
                                          reply_markup=None)
 
         data = await state.get_data()
@@ -208,41 +202,34 @@ async def send_add_content(callback: CallbackQuery, state: FSMContext, bot: Bot)
         action = data['action']
         first_text = ''
         if action == 'sell':
-            await callback.message.edit_text(text=f'🤖 Благодарю, специалист свяжется с вами в ближайшее время и озвучит сумму,'
-                                                  f' за которую мы готовы купить ваш автомобиль, а пока вступайте в наш канал,'
-                                                  f' чтобы познакомиться поближе\n\n'
-                                                  f'https://t.me/kirianov_al',
+            await callback.message.edit_text(text=render('thanks_sell'),
                                              reply_markup=None)
-            first_text = f'Пользователь @{callback.from_user.username} оставил запрос на продажу автомобиля'
+            first_text = render('lead_sell', username=callback.from_user.username)
         elif action == 'bay':
-            await callback.message.edit_text(text=f'🤖 Благодарю за обращение, мы свяжемся с вами для консультации в ближайшее время,'
-                                                  f' а пока вступайте в наш канал, чтобы познакомиться поближе\n\n'
-                                                  f'https://t.me/kirianov_al',
+            await callback.message.edit_text(text=render('thanks_bay'),
                                              reply_markup=None)
-            first_text = f'Пользователь @{callback.from_user.username} оставил запрос на покупку автомобиля'
-        for admin in config.tg_bot.admin_ids.split(','):
-            try:
-                for item in content:
-                    try:
-                        await bot.send_photo(chat_id=admin,
-                                             photo=item)
-                    except:
-                        try:
-                            await bot.send_video(chat_id=admin,
-                                                 video=item)
-                        except:
-                            await bot.send_document(chat_id=admin,
-                                                    document=item)
-            except:
-                await bot.send_message(chat_id=admin,
-                                       text='Не удалось отправить контент')
-            try:
-                await bot.send_message(chat_id=admin,
-                                       text=f'<b>{first_text}:</b>\n\n'
-                                            f'<b>Имя:</b> {data["name"]}\n'
-                                            f'<b>Телефон:</b> {data["phone"]}\n'
-                                            f'<b>Запрос от пользователя:</b> {request_user}\n')
-
-            except:
-                pass
+            first_text = render('lead_bay', username=callback.from_user.username)
+        text = render('lead', title=first_text, name=data['name'], phone=data['phone'],
+                      request_user=request_user)
+        # такая же заявка уже была недавно - объединяем с ней, администраторам повторно не отправляем
+        fingerprint = lead_fingerprint(data['phone'], action, request_user, content)
+        if await lead_dedup.is_duplicate(fingerprint, window=config.delivery.dedup_window):
+            lead_writer.add_repeat(fingerprint)
+            await state.set_state(state=None)
+            return
+        # заявка сохраняется в БД пачкой в фоне
+        lead_writer.put({'tg_id': callback.from_user.id,
+                         'username': callback.from_user.username,
+                         'action': action,
+                         'name': data['name'],
+                         'phone': data['phone'],
+                         'request_user': request_user,
+                         'created_at': time.time(),
+                         'fingerprint': fingerprint,
+                         'content': content})
+        # рассылка администраторам выполняется в фоне, callback не ждет ее завершения
+        lead_delivery.submit(bot=bot,
+                             chat_ids=config.tg_bot.admin_ids,
+                             text=text,
+                             content=content)
         await state.set_state(state=None)
@@ -2,63 +2,60 @@ import asyncio
 
 from aiogram import Router
 from aiogram.types import Message, CallbackQuery
-from aiogram.types import FSInputFile
-from database.requests import get_all_users
-from config_data.config import Config, load_config
+from aiogram.types import BufferedInputFile
+from database.requests import count_users
+from services.snapshot import db_snapshot
+from services.user_export import CSV_THRESHOLD, pack_messages, send_texts, user_lines, users_csv
+from config_data.config import Config
+from config_data.log_config import read_recent_log
 
 import logging
 
 router = Router()
-config: Config = load_config()
 
 
 @router.callback_query()
 async def all_callback(callback: CallbackQuery) -> None:
-    logging.info(f'all_callback: {callback.message.chat.id} / {callback.data}')
+    logging.info('all_callback: %s / %s', callback.message.chat.id, callback.data)
     await callback.message.answer(text='Я вас не понимаю!')
     await callback.answer()
 
 
 @router.message()
-async def all_message(message: Message) -> None:
-    logging.info(f'all_message {message.chat.id} / {message.text}')
+async def all_message(message: Message, config: Config) -> None:
+    logging.info('all_message %s / %s', message.chat.id, message.text)
     if message.photo:
-        logging.info(f'all_message message.photo')
+        logging.info('all_message message.photo')
         print(message.photo[-1].file_id)
 
     if message.video:
-        logging.info(f'all_message message.photo')
+        logging.info('all_message message.photo')
         print(message.video.file_id)
 
     if message.sticker:
-        logging.info(f'all_message message.sticker')
+        logging.info('all_message message.sticker')
 
     # команды доступные администраторам
-    list_super_admin = list(map(int, config.tg_bot.admin_ids.split(',')))
-    if message.chat.id in list_super_admin:
-        logging.info(f'all_message message.admin')
+    if message.chat.id in config.tg_bot.admin_ids:
+        logging.info('all_message message.admin')
         if message.text == '/get_logfile':
-            logging.info(f'all_message message.admin./get_logfile')
-            file_path = "py_log.log"
-            await message.answer_document(FSInputFile(file_path))
+            logging.info('all_message message.admin./get_logfile')
+            # последняя часть лога в сжатом виде, чтение файла - в отдельном потоке
+            data = await asyncio.to_thread(read_recent_log, config.logging.path)
+            await message.answer_document(BufferedInputFile(data, filename='py_log.log.gz'))
 
         elif message.text == '/get_dbfile':
-            logging.info(f'all_message message.admin./get_dbfile')
-            file_path = "database/db.sqlite3"
-            await message.answer_document(FSInputFile(file_path))
+            logging.info('all_message message.admin./get_dbfile')
+            # согласованный снимок БД, а не файл, в который бот продолжает писать
+            await message.answer_document(await db_snapshot.get())
 
         elif message.text == '/get_listusers':
-            logging.info(f'all_message message.admin./get_listusers')
-            list_user = await get_all_users()
-            text = 'Список пользователей:\n\n'
-            for i, user in enumerate(list_user):
-                text += f'{i+1}. @{user.username}/{user.tg_id}\n'
-                if i % 10 == 0 and i > 0:
-                    await asyncio.sleep(0.2)
-                    await message.answer(text=text)
-                    text = ''
-            await message.answer(text=text)
-
+            logging.info('all_message message.admin./get_listusers')
+            if await count_users() > CSV_THRESHOLD:
+                document = BufferedInputFile(await users_csv(), filename='users.csv')
+                await message.answer_document(document, caption='Список пользователей')
+            else:
+                await send_texts(message, pack_messages(user_lines(), header='Список пользователей:\n\n'))
 
         else:
             await message.answer('Я вас не понимаю!')
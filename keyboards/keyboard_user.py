@@ -1,20 +1,21 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton
-from aiogram.utils.keyboard import InlineKeyboardBuilder
-from database.models import User
-import logging
+from functools import lru_cache
+from lexicon.lexicon import DEFAULT_LANG, render
 
+# Клавиатуры не меняются, поэтому создаются один раз для каждого языка и переиспользуются
 
-def keyboard_action() -> InlineKeyboardMarkup:
-    logging.info("keyboard_action")
-    button_1 = InlineKeyboardButton(text='Продать', callback_data=f'action_sell')
-    button_2 = InlineKeyboardButton(text='Купить', callback_data=f'action_bay')
+
+@lru_cache(maxsize=None)
+def keyboard_action(lang: str = DEFAULT_LANG) -> InlineKeyboardMarkup:
+    button_1 = InlineKeyboardButton(text=render('button_sell', lang), callback_data=f'action_sell')
+    button_2 = InlineKeyboardButton(text=render('button_bay', lang), callback_data=f'action_bay')
     keyboard = InlineKeyboardMarkup(inline_keyboard=[[button_1], [button_2]],)
     return keyboard
 
 
-def keyboards_get_contact() -> ReplyKeyboardMarkup:
-    logging.info("keyboards_get_contact")
-    button_1 = KeyboardButton(text='Отправить свой контакт ☎️',
+@lru_cache(maxsize=None)
+def keyboards_get_contact(lang: str = DEFAULT_LANG) -> ReplyKeyboardMarkup:
+    button_1 = KeyboardButton(text=render('button_contact', lang),
                               request_contact=True)
     keyboard = ReplyKeyboardMarkup(
         keyboard=[[button_1]],
@@ -23,9 +24,9 @@ def keyboards_get_contact() -> ReplyKeyboardMarkup:
     return keyboard
 
 
-def keyboard_send() -> InlineKeyboardMarkup:
-    logging.info("keyboard_send")
-    button_1 = InlineKeyboardButton(text='Отправить', callback_data=f'send_content')
-    button_2 = InlineKeyboardButton(text='Добавить', callback_data=f'add_content')
+@lru_cache(maxsize=None)
+def keyboard_send(lang: str = DEFAULT_LANG) -> InlineKeyboardMarkup:
+    button_1 = InlineKeyboardButton(text=render('button_send', lang), callback_data=f'send_content')
+    button_2 = InlineKeyboardButton(text=render('button_add', lang), callback_data=f'add_content')
     keyboard = InlineKeyboardMarkup(inline_keyboard=[[button_2], [button_1]],)
-    return keyboard
\ No newline at end of file
+    return keyboard
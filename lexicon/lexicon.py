@@ -0,0 +1,70 @@
+from functools import lru_cache
+
+DEFAULT_LANG = 'ru'
+
+LEXICON: dict[str, dict[str, str]] = {
+    'ru': {
+        'start': '🤖 Добрый день, мы рады вас видеть.\n'
+                 'Хотите продать или купить автомобиль?',
+        'ask_name_sell': '🤖 Хорошо, сейчас оценим, а пока давайте познакомимся.\n'
+                         'Как вас зовут?',
+        'ask_name_bay': '🤖 Хорошо. Давайте познакомимся.\n'
+                        'Как вас зовут?',
+        'ask_phone': 'Укажите ваш номер телефона или нажмите внизу 👇\n'
+                     '"Отправить свой контакт ☎️"',
+        'wrong_phone_empty': 'Отправьте номер телефона текстом или кнопкой "Отправить свой контакт ☎️".',
+        'wrong_phone_chars': 'Номер может содержать только цифры, повторите ввод.',
+        'wrong_phone_length': 'Номер должен содержать 10 цифр после +7 или 8, повторите ввод.',
+        'ask_request_bay': '🤖 Очень приятно, {name}. '
+                           'Опишите параметры интересующего автомобиля - марка, модель, бюджет.',
+        'ask_request_sell': '🤖 Очень приятно, {name}. '
+                            'Какой у вас автомобиль? Марка, год, пробег, пожелание по цене',
+        'ask_content': '📎 Прикрепите фото (можно несколько), видео или документ.',
+        'attachments_limit': 'Можно прикрепить не более {limit} файлов, лишние файлы не будут отправлены.',
+        'add_or_send': 'Добавить еще материал или отправить?',
+        'content_sent': 'Материалы от вас переданы\n\n'
+                        'Спасибо! С вами свяжутся',
+        'thanks_sell': '🤖 Благодарю, специалист свяжется с вами в ближайшее время и озвучит сумму,'
+                       ' за которую мы готовы купить ваш автомобиль, а пока вступайте в наш канал,'
+                       ' чтобы познакомиться поближе\n\n'
+                       'https://t.me/kirianov_al',
+        'thanks_bay': '🤖 Благодарю за обращение, мы свяжемся с вами для консультации в ближайшее время,'
+                      ' а пока вступайте в наш канал, чтобы познакомиться поближе\n\n'
+                      'https://t.me/kirianov_al',
+        'lead_sell': 'Пользователь @{username} оставил запрос на продажу автомобиля',
+        'lead_bay': 'Пользователь @{username} оставил запрос на покупку автомобиля',
+        'lead': '<b>{title}:</b>\n\n'
+                '<b>Имя:</b> {name}\n'
+                '<b>Телефон:</b> {phone}\n'
+                '<b>Запрос от пользователя:</b> {request_user}\n',
+        'button_sell': 'Продать',
+        'button_bay': 'Купить',
+        'button_contact': 'Отправить свой контакт ☎️',
+        'button_send': 'Отправить',
+        'button_add': 'Добавить',
+    }
+}
+
+
+@lru_cache(maxsize=None)
+def template(key: str, lang: str = DEFAULT_LANG) -> str:
+    """
+    Шаблон по ключу на языке lang, если перевода нет - на языке по умолчанию
+    :param key:
+    :param lang:
+    :return:
+    """
+    return LEXICON.get(lang, {}).get(key) or LEXICON[DEFAULT_LANG][key]
+
+
+def render(key: str, lang: str = DEFAULT_LANG, **params) -> str:
+    """
+    Текст сообщения. Тексты без параметров берутся из кэша шаблонов как есть,
+    пользовательские данные подставляются без кэширования, чтобы не держать их в памяти
+    :param key:
+    :param lang:
+    :param params: значения для подстановки в шаблон
+    :return:
+    """
+    text = template(key, lang)
+    return text.format(**params) if params else text
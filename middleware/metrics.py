@@ -0,0 +1,57 @@
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject
+
+from services.metrics import API_ERRORS, API_REQUESTS, API_SECONDS, HANDLER_IN_FLIGHT, HANDLER_SECONDS
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """
+    Inner middleware: время выполнения каждого обработчика и число обрабатываемых апдейтов
+    """
+
+    def __init__(self, event: str) -> None:
+        self.event = event
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        name = data['handler'].callback.__name__
+        HANDLER_IN_FLIGHT.inc(self.event)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - started, name)
+            HANDLER_IN_FLIGHT.dec(self.event)
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """
+    Middleware сессии бота: количество, время и ошибки запросов к Bot API
+    """
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType]
+    ) -> Response[TelegramType]:
+        name = method.__api_method__
+        API_REQUESTS.inc(name)
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception:
+            API_ERRORS.inc(name)
+            raise
+        finally:
+            API_SECONDS.observe(time.perf_counter() - started, name)
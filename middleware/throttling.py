@@ -0,0 +1,90 @@
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import TelegramObject, Update
+
+from services.metrics import Counter
+from services.rate_limit import TokenBucket
+
+THROTTLED = Counter('bot_throttled_total', 'Updates dropped by throttling', ('key',))
+
+# при таком количестве bucket удаляем те, что уже полностью восстановились
+CLEANUP_SIZE = 10_000
+
+
+def throttling_key(update: Update) -> Optional[str]:
+    """
+    Группа лимитов для апдейта: start, media, message, callback или None для остальных типов
+    :param update:
+    :return:
+    """
+    if update.callback_query is not None:
+        return 'callback'
+    message = update.message
+    if message is None:
+        return None
+    if message.text and message.text.startswith('/start'):
+        return 'start'
+    if message.photo or message.video or message.document:
+        return 'media'
+    return 'message'
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Outer middleware на уровне Update: token bucket на пользователя для каждой группы лимитов.
+    Регистрируется перед FSMContextMiddleware диспетчера (см. register), поэтому лишние апдейты
+    отбрасываются до фильтров, хранилища FSM и БД
+    """
+
+    def __init__(self, limits: Dict[str, tuple[float, float]]) -> None:
+        """
+        :param limits: группа -> (скорость, апдейтов в секунду; допустимая серия подряд)
+        """
+        self.limits = limits
+        self._buckets: Dict[tuple[int, str], TokenBucket] = {}
+
+    def register(self, dp: Dispatcher) -> None:
+        """
+        Ставим middleware в цепочку апдейтов перед FSMContextMiddleware, который читает состояние
+        из хранилища для каждого апдейта
+        :param dp:
+        :return:
+        """
+        dp.update.outer_middleware.unregister(dp.fsm)
+        dp.update.outer_middleware(self)
+        dp.update.outer_middleware(dp.fsm)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        # пользователя уже определил UserContextMiddleware диспетчера
+        user = data.get('event_from_user')
+        key = throttling_key(event)
+        if user is None or key is None:
+            return await handler(event, data)
+        bucket = self._bucket(user.id, key)
+        if bucket is not None and not bucket.consume():
+            THROTTLED.inc(key)
+            return None
+        return await handler(event, data)
+
+    def _bucket(self, user_id: int, key: str) -> Optional[TokenBucket]:
+        limit = self.limits.get(key)
+        if limit is None:
+            return None
+        bucket = self._buckets.get((user_id, key))
+        if bucket is None:
+            if len(self._buckets) >= CLEANUP_SIZE:
+                self._cleanup()
+            bucket = self._buckets[(user_id, key)] = TokenBucket(rate=limit[0], capacity=limit[1])
+        return bucket
+
+    def _cleanup(self) -> None:
+        now = time.monotonic()
+        self._buckets = {key: bucket for key, bucket in self._buckets.items()
+                         if bucket.tokens + (now - bucket.updated) * bucket.rate < bucket.capacity}
@@ -0,0 +1,61 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, Hashable, Optional
+
+
+class AlbumAggregator:
+    """
+    Собираем части альбома Telegram (сообщения с одним media_group_id) в памяти,
+    чтобы записать их в FSM одним обновлением
+    """
+
+    def __init__(self, delay: float = 0.5) -> None:
+        self.delay = delay
+        self._albums: dict[Hashable, list] = {}
+        self._locks: dict[int, list] = {}
+
+    async def collect(self, key: Hashable, order: int, item: Any) -> Optional[list]:
+        """
+        Добавляем часть альбома. Первый вызов ждет, пока в течение delay не перестанут
+        приходить новые части, и возвращает весь альбом; остальные вызовы возвращают None
+        :param key: (chat_id, media_group_id)
+        :param order: message_id части, обработчики могут дойти сюда не в порядке альбома
+        :param item:
+        :return: части альбома в порядке order
+        """
+        album = self._albums.get(key)
+        if album is not None:
+            album.append((order, item))
+            return None
+        album = self._albums[key] = [(order, item)]
+        try:
+            size = 0
+            while size != len(album):
+                size = len(album)
+                await asyncio.sleep(self.delay)
+        finally:
+            del self._albums[key]
+        album.sort(key=lambda part: part[0])
+        return [item for _, item in album]
+
+    @asynccontextmanager
+    async def user_lock(self, user_id: int):
+        """
+        Сериализуем чтение-изменение-запись FSM одного пользователя
+        :param user_id:
+        :return:
+        """
+        entry = self._locks.get(user_id)
+        if entry is None:
+            entry = self._locks[user_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[user_id]
+
+
+album_aggregator = AlbumAggregator()
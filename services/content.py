@@ -0,0 +1,43 @@
+from typing import NamedTuple, Optional, Sequence
+
+from aiogram.types import Message
+
+PHOTO = 'photo'
+VIDEO = 'video'
+DOCUMENT = 'document'
+
+
+class ContentItem(NamedTuple):
+    """
+    Вложение заявки. Хранится в FSM в виде компактного списка [kind, file_id, file_unique_id, caption]
+    """
+    kind: str
+    file_id: str
+    file_unique_id: str
+    caption: Optional[str] = None
+
+    @classmethod
+    def from_message(cls, message: Message) -> Optional['ContentItem']:
+        """
+        Определяем тип вложения в момент получения сообщения
+        :param message:
+        :return: None если в сообщении нет фото, видео или документа
+        """
+        if message.photo:
+            media, kind = message.photo[-1], PHOTO
+        elif message.video:
+            media, kind = message.video, VIDEO
+        elif message.document:
+            media, kind = message.document, DOCUMENT
+        else:
+            return None
+        return cls(kind, media.file_id, media.file_unique_id, message.caption)
+
+    @classmethod
+    def from_record(cls, record: Sequence) -> 'ContentItem':
+        """
+        Восстанавливаем вложение из записи FSM (после JSON-хранилища это list)
+        :param record:
+        :return:
+        """
+        return cls(*record)
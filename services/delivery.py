@@ -0,0 +1,219 @@
+import asyncio
+import logging
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Iterable, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import InputMediaDocument, InputMediaPhoto, InputMediaVideo
+
+from services.content import DOCUMENT, PHOTO, VIDEO, ContentItem
+from services.metrics import Counter as MetricCounter, Gauge, collectors
+from services.rate_limit import TokenBucket, acquire, call_with_retry
+
+# максимальный размер альбома sendMediaGroup
+ALBUM_SIZE = 10
+
+INPUT_MEDIA = {PHOTO: InputMediaPhoto, VIDEO: InputMediaVideo, DOCUMENT: InputMediaDocument}
+
+
+def split_albums(items: list[ContentItem]) -> list[list[ContentItem]]:
+    """
+    Разбиваем вложения на альбомы: документы нельзя смешивать с фото и видео,
+    порядок вложений сохраняется
+    :param items:
+    :return:
+    """
+    albums = []
+    for item in items:
+        is_document = item.kind == DOCUMENT
+        if albums and len(albums[-1]) < ALBUM_SIZE and (albums[-1][0].kind == DOCUMENT) == is_document:
+            albums[-1].append(item)
+        else:
+            albums.append([item])
+    return albums
+
+
+@dataclass
+class DeliveryJob:
+    """
+    Рассылка заявки одному администратору, items - еще не отправленные вложения
+    """
+    chat_id: int
+    text: str
+    items: list[ContentItem]
+
+    def to_record(self) -> dict:
+        return {'chat_id': self.chat_id, 'text': self.text, 'items': [list(item) for item in self.items]}
+
+    @classmethod
+    def from_record(cls, record: dict) -> 'DeliveryJob':
+        return cls(chat_id=record['chat_id'],
+                   text=record['text'],
+                   items=[ContentItem.from_record(item) for item in record['items']])
+
+
+class LeadDelivery:
+    """
+    Рассылка заявок администраторам: альбомы sendMediaGroup до 10 файлов,
+    параллельно по администраторам через ограниченный пул с учетом лимитов Telegram
+    """
+
+    def __init__(self, concurrency: int = 4, global_rate: float = 25, chat_rate: float = 1,
+                 chat_burst: float = 3) -> None:
+        self._jobs: dict[asyncio.Task, DeliveryJob] = {}
+        # после начала drain новые задания не запускаются, а сразу передаются в spill
+        self._stopping = False
+        self.spill: Optional[Callable[[list[DeliveryJob]], None]] = None
+        self.stats = Counter()
+        self.set_limits(concurrency=concurrency, global_rate=global_rate, chat_rate=chat_rate,
+                        chat_burst=chat_burst)
+
+    def set_limits(self, concurrency: int, global_rate: float, chat_rate: float, chat_burst: float) -> None:
+        """
+        Задаем лимиты отправки: общий и на один чат (сообщений в секунду)
+        :param concurrency: сколько администраторов обслуживается одновременно
+        :param global_rate:
+        :param chat_rate:
+        :param chat_burst: сколько сообщений можно отправить в чат подряд без ожидания
+        :return:
+        """
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._global = TokenBucket(rate=global_rate, capacity=global_rate)
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._chats: dict[int, TokenBucket] = {}
+
+    def submit(self, bot: Bot, chat_ids: Iterable[int], text: str, content: list) -> None:
+        """
+        Ставим заявку в фоновую рассылку и сразу возвращаем управление
+        :param bot:
+        :param chat_ids: получатели
+        :param text: текст заявки
+        :param content: записи вложений ContentItem
+        :return:
+        """
+        self.stats['leads'] += 1
+        items = [ContentItem.from_record(record) for record in content]
+        self.resume(bot, [DeliveryJob(chat_id=chat_id, text=text, items=items) for chat_id in chat_ids])
+
+    def resume(self, bot: Bot, jobs: Iterable[DeliveryJob]) -> None:
+        """
+        Запускаем рассылку по готовым заданиям, например не завершенным до перезапуска бота
+        :param bot:
+        :param jobs:
+        :return:
+        """
+        if self._stopping:
+            jobs = list(jobs)
+            if self.spill is None:
+                logging.error('LeadDelivery: %s deliveries received after drain are lost', len(jobs))
+            elif jobs:
+                self.spill(jobs)
+            return
+        for job in jobs:
+            task = asyncio.create_task(self._deliver(bot, job))
+            self._jobs[task] = job
+            task.add_done_callback(self._forget)
+
+    def _forget(self, task: asyncio.Task) -> None:
+        self._jobs.pop(task, None)
+
+    async def join(self) -> None:
+        """
+        Ждем завершения всех рассылок, поставленных в очередь
+        :return:
+        """
+        while self._jobs:
+            await asyncio.gather(*self._jobs, return_exceptions=True)
+
+    async def drain(self, timeout: float) -> list[DeliveryJob]:
+        """
+        Ждем завершения рассылок не дольше timeout секунд, оставшиеся прерываем
+        :param timeout:
+        :return: незавершенные задания с еще не отправленными вложениями
+        """
+        self._stopping = True
+        if not self._jobs:
+            return []
+        _, pending = await asyncio.wait(list(self._jobs), timeout=timeout)
+        unfinished = [self._jobs[task] for task in pending]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        return unfinished
+
+    async def _deliver(self, bot: Bot, job: DeliveryJob) -> None:
+        chat_id = job.chat_id
+        async with self._semaphore:
+            try:
+                for album in split_albums(job.items):
+                    await self._send_album(bot, chat_id, album)
+                    job.items = job.items[len(album):]
+                    self.stats['items'] += len(album)
+            except TelegramAPIError:
+                logging.exception('LeadDelivery: content not delivered to %s', chat_id)
+                job.items = []
+                try:
+                    await self._call(chat_id, lambda: bot.send_message(chat_id=chat_id,
+                                                                       text='Не удалось отправить контент'))
+                except TelegramAPIError:
+                    pass
+            try:
+                await self._call(chat_id, lambda: bot.send_message(chat_id=chat_id, text=job.text))
+            except TelegramAPIError:
+                logging.exception('LeadDelivery: lead text not delivered to %s', chat_id)
+
+    async def _call(self, chat_id: int, factory, amount: float = 1.0):
+        """
+        Запрос к Bot API с учетом лимитов на чат и глобального лимита
+        :param chat_id:
+        :param factory:
+        :param amount: сколько сообщений отправляет запрос
+        :return:
+        """
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = TokenBucket(rate=self._chat_rate, capacity=self._chat_burst)
+        await acquire(bucket, self._global, amount=amount)
+        self.stats['api_calls'] += 1
+        try:
+            return await call_with_retry(factory)
+        except TelegramAPIError:
+            self.stats['api_failures'] += 1
+            raise
+
+    async def _send_album(self, bot: Bot, chat_id: int, album: list[ContentItem]) -> None:
+        # подписи набраны пользователем, поэтому отправляем их как обычный текст без разметки HTML
+        if len(album) > 1:
+            media = [INPUT_MEDIA[item.kind](media=item.file_id, caption=item.caption, parse_mode=None)
+                     for item in album]
+            await self._call(chat_id, lambda: bot.send_media_group(chat_id=chat_id, media=media),
+                             amount=len(album))
+            return
+        item = album[0]
+        if item.kind == PHOTO:
+            await self._call(chat_id, lambda: bot.send_photo(chat_id=chat_id, photo=item.file_id,
+                                                             caption=item.caption, parse_mode=None))
+        elif item.kind == VIDEO:
+            await self._call(chat_id, lambda: bot.send_video(chat_id=chat_id, video=item.file_id,
+                                                             caption=item.caption, parse_mode=None))
+        else:
+            await self._call(chat_id, lambda: bot.send_document(chat_id=chat_id, document=item.file_id,
+                                                                caption=item.caption, parse_mode=None))
+
+
+lead_delivery = LeadDelivery()
+
+DELIVERY = MetricCounter('bot_lead_delivery_total', 'Lead delivery counters', ('stat',))
+DELIVERY_FAILURES = Gauge('bot_lead_delivery_failures_per_item', 'Failed Bot API calls per delivered attachment')
+
+
+def collect_delivery() -> None:
+    for stat, value in lead_delivery.stats.items():
+        DELIVERY.values[(stat,)] = value
+    DELIVERY_FAILURES.values[()] = lead_delivery.stats['api_failures'] / max(lead_delivery.stats['items'], 1)
+
+
+collectors.append(collect_delivery)
@@ -0,0 +1,116 @@
+import asyncio
+import hashlib
+import logging
+import time
+import traceback
+from typing import Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import BufferedInputFile
+
+from services.rate_limit import call_with_retry
+
+
+def fingerprint(exception: BaseException) -> str:
+    """
+    Отпечаток ошибки: тип исключения и места в коде, через которые оно прошло
+    :param exception:
+    :return:
+    """
+    frames = traceback.extract_tb(exception.__traceback__)
+    key = type(exception).__qualname__ + ''.join(f'|{frame.filename}:{frame.lineno}' for frame in frames)
+    return hashlib.sha1(key.encode()).hexdigest()[:12]
+
+
+class ErrorReporter:
+    """
+    Фоновая отправка ошибок в поддержку: одинаковые ошибки за окно window секунд
+    отправляются один раз, остальные суммируются в сводку; не более max_reports отчетов за окно
+    """
+
+    def __init__(self, chat_id: int, window: float = 60, max_reports: int = 5) -> None:
+        self.chat_id = chat_id
+        self.window = window
+        self.max_reports = max_reports
+        self._queue: asyncio.Queue[Optional[BaseException]] = asyncio.Queue(maxsize=1000)
+        self._task: Optional[asyncio.Task] = None
+        self._counts: dict[str, list] = {}
+        self._reports = 0
+        self._window_end = 0.0
+
+    async def start(self, bot: Bot) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(bot))
+
+    def report(self, exception: BaseException) -> None:
+        """
+        Ставим ошибку в очередь на отправку, не блокируя обработку апдейтов
+        :param exception:
+        :return:
+        """
+        try:
+            self._queue.put_nowait(exception)
+        except asyncio.QueueFull:
+            pass
+
+    async def stop(self) -> None:
+        """
+        Отправляем сводку за текущее окно и останавливаем отправку
+        :return:
+        """
+        if self._task is None:
+            return
+        if self._queue.full():
+            # при потоке ошибок очередь может быть заполнена: освобождаем место для маркера остановки
+            self._queue.get_nowait()
+        self._queue.put_nowait(None)
+        await self._task
+        self._task = None
+
+    async def _run(self, bot: Bot) -> None:
+        loop = asyncio.get_running_loop()
+        self._window_end = loop.time() + self.window
+        while True:
+            try:
+                exception = await asyncio.wait_for(self._queue.get(), self._window_end - loop.time())
+            except asyncio.TimeoutError:
+                await self._flush(bot)
+                self._window_end = loop.time() + self.window
+                continue
+            if exception is None:
+                await self._flush(bot)
+                return
+            await self._handle(bot, exception)
+
+    async def _handle(self, bot: Bot, exception: BaseException) -> None:
+        key = fingerprint(exception)
+        entry = self._counts.get(key)
+        if entry is not None:
+            entry[0] += 1
+            return
+        self._counts[key] = entry = [1, time.time(), f'{type(exception).__name__}: {exception}']
+        if self._reports >= self.max_reports:
+            return
+        self._reports += 1
+        # 0 - уже отправлено, в сводку попадут только повторы
+        entry[0] = 0
+        text = ''.join(traceback.format_exception(type(exception), exception, exception.__traceback__))
+        await self._send(bot, text=entry[2][:4096],
+                         document=BufferedInputFile(text.encode(), filename=f'error_{key}.txt'))
+
+    async def _flush(self, bot: Bot) -> None:
+        lines = [f'{message} ×{count} за {self.window:.0f} с'
+                 for count, _, message in self._counts.values() if count]
+        self._counts.clear()
+        self._reports = 0
+        if lines:
+            await self._send(bot, text='\n'.join(lines)[:4096])
+
+    async def _send(self, bot: Bot, text: str, document: Optional[BufferedInputFile] = None) -> None:
+        try:
+            await call_with_retry(lambda: bot.send_message(chat_id=self.chat_id, text=text, parse_mode=None))
+            if document:
+                await call_with_retry(lambda: bot.send_document(chat_id=self.chat_id, document=document))
+        except TelegramAPIError:
+            logging.exception('ErrorReporter: report not sent')
@@ -0,0 +1,70 @@
+import hashlib
+import time
+from typing import Iterable, Sequence
+
+import database.requests as rq
+from database.cache import KeyCache
+
+
+def lead_fingerprint(phone: str, action: str, request_user: str, content: Iterable[Sequence]) -> str:
+    """
+    Отпечаток заявки: телефон, действие и хэш текста запроса вместе с file_unique_id вложений
+    :param phone: номер в формате E.164
+    :param action:
+    :param request_user:
+    :param content: записи вложений ContentItem
+    :return:
+    """
+    digest = hashlib.sha1(' '.join(request_user.split()).lower().encode())
+    for file_unique_id in sorted(item[2] for item in content):
+        digest.update(b'\0' + file_unique_id.encode())
+    return f'{phone}:{action}:{digest.hexdigest()[:20]}'
+
+
+class LeadDedup:
+    """
+    Индекс отпечатков заявок в памяти (с вытеснением по времени) поверх таблицы leads
+    и защита от повторной обработки одного и того же нажатия "Отправить"
+    """
+
+    def __init__(self) -> None:
+        self._seen: dict[str, float] = {}
+        self._callbacks = KeyCache(maxsize=10_000, ttl=24 * 3600)
+
+    def claim_submit(self, chat_id: int, message_id: int) -> bool:
+        """
+        Отмечаем отправку заявки из сообщения message_id
+        :param chat_id:
+        :param message_id:
+        :return: False если заявка из этого сообщения уже отправлялась
+        """
+        key = (chat_id, message_id)
+        if self._callbacks.contains(key):
+            return False
+        self._callbacks.add(key)
+        return True
+
+    async def is_duplicate(self, fingerprint: str, window: float) -> bool:
+        """
+        Проверяем, была ли такая заявка за последние window секунд, и запоминаем отпечаток
+        :param fingerprint:
+        :param window:
+        :return:
+        """
+        now = time.time()
+        self._evict(now - window)
+        if fingerprint in self._seen:
+            return True
+        self._seen[fingerprint] = now
+        return await rq.has_recent_lead(fingerprint, since=now - window)
+
+    def _evict(self, before: float) -> None:
+        # отпечатки хранятся в порядке добавления, самые старые - в начале
+        while self._seen:
+            fingerprint, seen = next(iter(self._seen.items()))
+            if seen >= before:
+                break
+            del self._seen[fingerprint]
+
+
+lead_dedup = LeadDedup()
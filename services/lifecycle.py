@@ -0,0 +1,154 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Sequence
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import TelegramObject
+
+import database.models as models
+from config_data.config import Config
+from database.lead_writer import lead_writer
+from services.delivery import DeliveryJob, lead_delivery
+from services.error_reporter import ErrorReporter
+
+
+class PendingFile:
+    """
+    JSON-файл с незавершенной работой: рассылки и заявки, не записанные в БД.
+    Записи дописываются к уже сохраненным, поэтому файл можно пополнять и после остановки служб
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _read(self) -> dict:
+        if not os.path.exists(self.path):
+            return {'deliveries': [], 'leads': []}
+        with open(self.path, encoding='utf-8') as file:
+            return json.load(file)
+
+    def add(self, deliveries: Sequence[dict] = (), leads: Sequence[dict] = ()) -> None:
+        """
+        Дописываем записи в файл
+        :param deliveries: записи DeliveryJob.to_record
+        :param leads: заявки LeadWriter
+        :return:
+        """
+        if not deliveries and not leads:
+            return
+        with self._lock:
+            pending = self._read()
+            pending['deliveries'].extend(deliveries)
+            pending['leads'].extend(leads)
+            # запись во временный файл и переименование, чтобы не оставить файл наполовину записанным
+            with open(self.path + '.tmp', 'w', encoding='utf-8') as file:
+                json.dump(pending, file, ensure_ascii=False)
+            os.replace(self.path + '.tmp', self.path)
+
+    def take(self) -> dict:
+        """
+        Читаем и удаляем файл
+        :return:
+        """
+        with self._lock:
+            pending = self._read()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return pending
+
+
+class Lifecycle:
+    """
+    Запуск и остановка фоновых служб бота. При остановке перестаем принимать апдейты, ждем
+    обработчики, рассылки и запись заявок не дольше shutdown_timeout, закрываем сессию бота и БД,
+    а незавершенное сохраняем в pending_path для повторной обработки при следующем запуске
+    """
+
+    def __init__(self, config: Config, error_reporter: ErrorReporter) -> None:
+        self.shutdown_timeout = config.lifecycle.shutdown_timeout
+        self.pending = PendingFile(config.lifecycle.pending_path)
+        self.error_reporter = error_reporter
+        self.accepting = False
+        # апдейты, которые сейчас обрабатываются
+        self.in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def register(self, dp: Dispatcher) -> None:
+        """
+        Ставим gate перед FSMContextMiddleware, чтобы отброшенные апдейты не читали хранилище FSM
+        :param dp:
+        :return:
+        """
+        dp.update.outer_middleware.unregister(dp.fsm)
+        dp.update.outer_middleware(self.gate)
+        dp.update.outer_middleware(dp.fsm)
+        dp.startup.register(self.on_startup)
+        dp.shutdown.register(self.on_shutdown)
+        # заявки и рассылки, появившиеся после остановки служб, сразу попадают в файл
+        lead_writer.spill = lambda leads: self.pending.add(leads=leads)
+        lead_delivery.spill = lambda jobs: self.pending.add(deliveries=[job.to_record() for job in jobs])
+
+    async def gate(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        # во время остановки новые апдейты не обрабатываем
+        if not self.accepting:
+            return None
+        self.in_flight += 1
+        self._idle.clear()
+        try:
+            return await handler(event, data)
+        finally:
+            self.in_flight -= 1
+            if not self.in_flight:
+                self._idle.set()
+
+    async def on_startup(self, bot: Bot) -> None:
+        await lead_writer.start()
+        await self.error_reporter.start(bot)
+        await self._replay(bot)
+        self.accepting = True
+
+    async def on_shutdown(self, bot: Bot) -> None:
+        self.accepting = False
+        deadline = time.monotonic() + self.shutdown_timeout
+        # обработчики еще могут поставить заявку в запись и рассылку, ждем их первыми
+        try:
+            await asyncio.wait_for(self._idle.wait(), self.shutdown_timeout)
+        except asyncio.TimeoutError:
+            logging.warning('Lifecycle: %s updates still in progress at shutdown', self.in_flight)
+        jobs = await lead_delivery.drain(timeout=max(deadline - time.monotonic(), 0))
+        leads = await lead_writer.stop(timeout=max(deadline - time.monotonic(), 0))
+        if jobs or leads:
+            logging.warning('Lifecycle: %s deliveries and %s leads saved for replay', len(jobs), len(leads))
+            await asyncio.to_thread(self.pending.add, deliveries=[job.to_record() for job in jobs], leads=leads)
+        try:
+            await asyncio.wait_for(self.error_reporter.stop(), max(deadline - time.monotonic(), 1))
+        except asyncio.TimeoutError:
+            logging.warning('Lifecycle: error report not sent before shutdown')
+        await bot.session.close()
+        await models.engine.dispose()
+
+    async def _replay(self, bot: Bot) -> None:
+        """
+        Повторно ставим в работу то, что не успели выполнить до прошлой остановки
+        :param bot:
+        :return:
+        """
+        if not os.path.exists(self.pending.path):
+            return
+        pending = await asyncio.to_thread(self.pending.take)
+        for lead in pending['leads']:
+            lead_writer.put(lead)
+        lead_delivery.resume(bot, [DeliveryJob.from_record(record) for record in pending['deliveries']])
+        logging.info('Lifecycle: replayed %s deliveries and %s leads',
+                     len(pending['deliveries']), len(pending['leads']))
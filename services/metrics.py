@@ -0,0 +1,138 @@
+import bisect
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Iterable, Optional
+
+from aiohttp import web
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(names: tuple, values: tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.values: dict[tuple, Any] = {}
+        registry.append(self)
+
+    def render(self) -> Iterable[str]:
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} {self.kind}'
+        for labels, value in self.values.items():
+            yield f'{self.name}{_labels(self.labels, labels)} {value}'
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+
+class Histogram(Metric):
+    """
+    Гистограмма: для каждого набора меток хранит [счетчики по корзинам, сумму, количество]
+    """
+    kind = 'histogram'
+
+    def observe(self, value: float, *labels: str) -> None:
+        entry = self.values.get(labels)
+        if entry is None:
+            entry = self.values[labels] = [[0] * (len(BUCKETS) + 1), 0.0, 0]
+        entry[0][bisect.bisect_left(BUCKETS, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    @contextmanager
+    def time(self, *labels: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def render(self) -> Iterable[str]:
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} histogram'
+        for labels, (buckets, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket in zip(BUCKETS + ('+Inf',), buckets):
+                cumulative += bucket
+                le = f'le="{bound}"'
+                yield f'{self.name}_bucket{_labels(self.labels, labels, le)} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.labels, labels)} {total}'
+            yield f'{self.name}_count{_labels(self.labels, labels)} {count}'
+
+
+registry: list[Metric] = []
+# функции, которые перед выдачей метрик обновляют значения из других счетчиков бота
+collectors: list[Callable[[], None]] = []
+
+HANDLER_SECONDS = Histogram('bot_handler_seconds', 'Handler latency', ('handler',))
+HANDLER_IN_FLIGHT = Gauge('bot_handler_in_flight', 'Updates being handled now', ('event',))
+FSM_STORAGE_SECONDS = Histogram('bot_fsm_storage_seconds', 'FSM storage operation latency', ('operation',))
+DB_QUERY_SECONDS = Histogram('bot_db_query_seconds', 'Database query latency', ('query',))
+API_SECONDS = Histogram('bot_api_seconds', 'Bot API request latency', ('method',))
+API_REQUESTS = Counter('bot_api_requests_total', 'Bot API requests', ('method',))
+API_ERRORS = Counter('bot_api_errors_total', 'Failed Bot API requests', ('method',))
+
+
+def db_timed(func: Callable) -> Callable:
+    """
+    Декоратор для функций database.requests: время выполнения запроса в DB_QUERY_SECONDS
+    :param func:
+    :return:
+    """
+    @wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        with DB_QUERY_SECONDS.time(func.__name__):
+            return await func(*args, **kwargs)
+    return wrapper
+
+
+def render() -> str:
+    for collect in collectors:
+        collect()
+    return '\n'.join(line for metric in registry for line in metric.render()) + '\n'
+
+
+async def metrics_view(request: web.Request) -> web.Response:
+    return web.Response(text=render(), content_type='text/plain', charset='utf-8')
+
+
+async def start_metrics_server(host: str, port: int) -> Optional[web.AppRunner]:
+    """
+    HTTP-эндпоинт /metrics в формате Prometheus
+    :param host:
+    :param port: 0 - эндпоинт выключен
+    :return:
+    """
+    if not port:
+        return None
+    app = web.Application()
+    app.router.add_get('/metrics', metrics_view)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host=host, port=port).start()
+    return runner
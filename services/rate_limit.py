@@ -0,0 +1,77 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable
+
+from aiogram.exceptions import TelegramRetryAfter
+
+
+class TokenBucket:
+    """
+    Token bucket: пополняется со скоростью rate токенов в секунду, хранит не более capacity токенов
+    """
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def consume(self, amount: float = 1.0) -> bool:
+        """
+        Забираем токены без ожидания
+        :param amount:
+        :return: False если токенов недостаточно
+        """
+        self._refill()
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return True
+        return False
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """
+        Резервируем токены (баланс может уйти в минус) и возвращаем время ожидания до их появления
+        :param amount:
+        :return: количество секунд, которое нужно подождать
+        """
+        self._refill()
+        self.tokens -= amount
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+async def acquire(*buckets: TokenBucket, amount: float = 1.0) -> None:
+    """
+    Ожидаем, пока во всех переданных bucket появятся токены
+    :param buckets:
+    :param amount:
+    :return:
+    """
+    delay = max(bucket.reserve(amount) for bucket in buckets)
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+
+async def call_with_retry(factory: Callable[[], Awaitable[Any]], attempts: int = 3) -> Any:
+    """
+    Выполняем запрос к Bot API, при TelegramRetryAfter ждем указанное время и повторяем
+    :param factory: функция, создающая корутину запроса
+    :param attempts:
+    :return:
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            return await factory()
+        except TelegramRetryAfter as e:
+            if attempt == attempts:
+                raise
+            logging.warning('call_with_retry: flood control, retry after %s s', e.retry_after)
+            await asyncio.sleep(e.retry_after)
@@ -0,0 +1,54 @@
+import asyncio
+import gzip
+import os
+import sqlite3
+import time
+from typing import Optional
+
+from aiogram.types import BufferedInputFile
+
+import database.models as models
+
+
+class DatabaseSnapshot:
+    """
+    Согласованная копия БД через online backup API SQLite. Копия создается в потоке,
+    чтобы не блокировать event loop, и переиспользуется в течение ttl секунд
+    """
+
+    def __init__(self, ttl: float = 60, compress: bool = True) -> None:
+        self.ttl = ttl
+        self.compress = compress
+        self._lock = asyncio.Lock()
+        self._snapshot: Optional[BufferedInputFile] = None
+        self._created = 0.0
+
+    async def get(self) -> BufferedInputFile:
+        """
+        Возвращаем готовый для отправки файл снимка БД
+        :return:
+        """
+        async with self._lock:
+            if self._snapshot is None or time.monotonic() - self._created > self.ttl:
+                path = models.engine.url.database
+                data = await asyncio.to_thread(self._backup, path)
+                filename = os.path.basename(path)
+                if self.compress:
+                    filename += '.gz'
+                self._snapshot = BufferedInputFile(data, filename=filename)
+                self._created = time.monotonic()
+            return self._snapshot
+
+    def _backup(self, path: str) -> bytes:
+        source = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+        target = sqlite3.connect(':memory:')
+        try:
+            source.backup(target)
+            data = target.serialize()
+        finally:
+            source.close()
+            target.close()
+        return gzip.compress(data) if self.compress else data
+
+
+db_snapshot = DatabaseSnapshot()
@@ -0,0 +1,65 @@
+import csv
+import io
+from typing import AsyncIterator
+
+from aiogram.types import Message
+
+import database.requests as rq
+from services.rate_limit import call_with_retry
+
+# ограничение Telegram на длину текста сообщения
+MESSAGE_LIMIT = 4096
+# начиная с этого количества пользователей список отправляется CSV-файлом
+CSV_THRESHOLD = 2000
+
+
+async def pack_messages(lines: AsyncIterator[str], header: str = '',
+                        limit: int = MESSAGE_LIMIT) -> AsyncIterator[str]:
+    """
+    Упаковываем строки в сообщения максимальной длины
+    :param lines:
+    :param header: текст в начале первого сообщения
+    :param limit:
+    :return:
+    """
+    parts, size = [header] if header else [], len(header)
+    async for line in lines:
+        if size + len(line) > limit and parts:
+            yield ''.join(parts)
+            parts, size = [], 0
+        parts.append(line[:limit])
+        size += len(parts[-1])
+    if parts:
+        yield ''.join(parts)
+
+
+async def user_lines() -> AsyncIterator[str]:
+    i = 0
+    async for user in rq.iter_users():
+        i += 1
+        yield f'{i}. @{user.username}/{user.tg_id}\n'
+
+
+async def users_csv() -> bytes:
+    """
+    Формируем CSV со списком пользователей
+    :return:
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(('id', 'tg_id', 'username'))
+    async for user in rq.iter_users():
+        writer.writerow(user)
+    # BOM, чтобы Excel корректно открыл кириллицу
+    return buffer.getvalue().encode('utf-8-sig')
+
+
+async def send_texts(message: Message, texts: AsyncIterator[str]) -> None:
+    """
+    Отправляем сообщения подряд, темп задают ответы Telegram RetryAfter
+    :param message:
+    :param texts:
+    :return:
+    """
+    async for text in texts:
+        await call_with_retry(lambda: message.answer(text=text), attempts=5)
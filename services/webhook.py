@@ -0,0 +1,93 @@
+import asyncio
+import contextlib
+import logging
+import signal
+from typing import Any, Dict
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from config_data.config import Config
+
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    """
+    Обработка апдейтов вебхука в фоне, одновременно существует не более max_concurrency задач.
+    Пока все слоты заняты, запрос Telegram ждет ответа и новые апдейты не принимаются
+    """
+
+    def __init__(self, *args: Any, max_concurrency: int, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        # слот занимаем до создания задачи, освобождаем по ее завершении (в том числе при отмене)
+        await self._semaphore.acquire()
+        try:
+            update: Dict[str, Any] = await request.json(loads=bot.session.json_loads)
+        except BaseException:
+            self._semaphore.release()
+            raise
+        task = asyncio.create_task(self._background_feed_update(bot=bot, update=update))
+        self._background_feed_update_tasks.add(task)
+        task.add_done_callback(self._background_feed_update_tasks.discard)
+        task.add_done_callback(lambda _: self._semaphore.release())
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+
+def build_app(dp: Dispatcher, bot: Bot, config: Config) -> web.Application:
+    """
+    aiohttp-приложение, принимающее апдейты Telegram на config.webhook.path
+    :param dp:
+    :param bot:
+    :param config:
+    :return:
+    """
+    app = web.Application()
+    # события startup/shutdown диспетчера регистрируем раньше закрытия сессии бота обработчиком
+    setup_application(app, dp, bot=bot)
+    BoundedRequestHandler(dispatcher=dp,
+                          bot=bot,
+                          handle_in_background=True,
+                          secret_token=config.webhook.secret,
+                          max_concurrency=config.webhook.max_concurrency
+                          ).register(app, path=config.webhook.path)
+    return app
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot, config: Config) -> None:
+    """
+    Запуск бота в режиме вебхука
+    :param dp:
+    :param bot:
+    :param config:
+    :return:
+    """
+    async def set_webhook(bot: Bot) -> None:
+        await bot.set_webhook(url=config.webhook.base_url + config.webhook.path,
+                              secret_token=config.webhook.secret,
+                              drop_pending_updates=config.webhook.drop_pending_updates,
+                              allowed_updates=dp.resolve_used_update_types())
+
+    dp.startup.register(set_webhook)
+    # SIGTERM (docker, systemd) и SIGINT завершают работу через runner.cleanup,
+    # который вызывает shutdown диспетчера и сохранение незавершенных заявок
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    signals = (signal.SIGTERM, signal.SIGINT)
+    for sig in signals:
+        with contextlib.suppress(NotImplementedError):
+            loop.add_signal_handler(sig, stop.set)
+    runner = web.AppRunner(build_app(dp, bot, config))
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host=config.webhook.host, port=config.webhook.port).start()
+        logging.info('run_webhook %s:%s%s', config.webhook.host, config.webhook.port, config.webhook.path)
+        await stop.wait()
+        logging.info('run_webhook: stopping')
+    finally:
+        await runner.cleanup()
+        for sig in signals:
+            with contextlib.suppress(NotImplementedError):
+                loop.remove_signal_handler(sig)
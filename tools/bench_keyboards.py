@@ -0,0 +1,58 @@
+"""
+Микробенчмарк: создание клавиатур и текстов на каждый апдейт против готовых объектов из кэша
+
+    python -m tools.bench_keyboards -n 20000
+"""
+import argparse
+import timeit
+import tracemalloc
+
+import keyboards.keyboard_user as kb
+from lexicon.lexicon import render
+
+KEYBOARDS = (kb.keyboard_action, kb.keyboards_get_contact, kb.keyboard_send)
+# имя пользователя подставляется в текст на каждом апдейте, поэтому текст с параметром
+NAME = 'Иван'
+
+
+def build_fresh(name: str = NAME) -> None:
+    # так клавиатуры и тексты создавались до кэширования
+    for keyboard in KEYBOARDS:
+        keyboard.__wrapped__()
+    _ = (f'🤖 Очень приятно, {name}. '
+         f'Какой у вас автомобиль? Марка, год, пробег, пожелание по цене')
+
+
+def build_cached(name: str = NAME) -> None:
+    for keyboard in KEYBOARDS:
+        keyboard()
+    _ = render('ask_request_sell', name=name)
+
+
+def peak_bytes(func) -> int:
+    """
+    Сколько памяти выделяется за один вызов (пик относительно состояния до вызова)
+    :param func:
+    :return:
+    """
+    tracemalloc.start()
+    func()
+    tracemalloc.reset_peak()
+    current = tracemalloc.get_traced_memory()[0]
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak - current
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Compare fresh vs cached keyboards and templates')
+    parser.add_argument('-n', '--number', type=int, default=20000)
+    args = parser.parse_args()
+    for name, func in (('fresh', build_fresh), ('cached', build_cached)):
+        seconds = min(timeit.repeat(func, number=args.number, repeat=3))
+        print(f'{name:<8}{seconds / args.number * 1e6:>10.2f} us/update{peak_bytes(func):>10} bytes/update')
+
+
+if __name__ == '__main__':
+    main()
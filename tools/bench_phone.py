@@ -0,0 +1,42 @@
+"""
+Бенчмарк проверки номера телефона: прежняя функция против нормализации, общее время и по каждому номеру.
+Прежняя функция только проверяет номер, нормализация еще собирает номер E.164 и PhoneCheck,
+поэтому на номерах без разделителей она медленнее; номера с разделителями прежняя функция отклоняла
+
+    python -m tools.bench_phone -n 100000
+"""
+import argparse
+import re
+import timeit
+
+from filter.filter import normalize_russian_phone_number
+
+SAMPLES = ('+79991234567', '89991234567', '9991234567', '+7 (999) 123-45-67', '8 999 123 45 67', 'abc', '+7999')
+
+
+def legacy_validate_russian_phone_number(phone_number):
+    # прежняя реализация: re.compile берет шаблон из кэша модуля re, разделители не допускаются
+    pattern = re.compile(r'^(\+7|8|7)?(\d{10})$')
+    match = pattern.match(phone_number)
+    return bool(match)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark phone validation')
+    parser.add_argument('-n', '--number', type=int, default=100000)
+    args = parser.parse_args()
+    funcs = (('legacy', legacy_validate_russian_phone_number), ('normalize', normalize_russian_phone_number))
+    for name, func in funcs:
+        seconds = min(timeit.repeat(lambda: [func(sample) for sample in SAMPLES], number=args.number, repeat=3))
+        results = [func(sample) for sample in SAMPLES]
+        accepted = sum(bool(result.phone if isinstance(result, tuple) else result) for result in results)
+        print(f'{name:<10}{seconds / (args.number * len(SAMPLES)) * 1e9:>8.0f} ns/call'
+              f'  accepted {accepted}/{len(SAMPLES)}')
+    for sample in SAMPLES:
+        times = [min(timeit.repeat(lambda: func(sample), number=args.number, repeat=3)) / args.number * 1e9
+                 for _, func in funcs]
+        print(f'{sample!r:<22}' + '  '.join(f'{name} {ns:>6.0f} ns' for (name, _), ns in zip(funcs, times)))
+
+
+if __name__ == '__main__':
+    main()
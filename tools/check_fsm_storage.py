@@ -0,0 +1,49 @@
+"""
+Проверка хранилища FSM на SQLite без Telegram и внешних сервисов: запись, чтение и истечение TTL
+
+    python -m tools.check_fsm_storage
+"""
+import asyncio
+import os
+import tempfile
+
+from aiogram.fsm.storage.base import StorageKey
+
+
+async def run() -> None:
+    import database.models as models
+    from database.fsm_storage import SQLiteStorage
+
+    tmp_dir = tempfile.mkdtemp(prefix='fsm_storage_')
+    models.init_engine(f'sqlite+aiosqlite:///{os.path.join(tmp_dir, "db.sqlite3")}')
+    await models.async_main()
+
+    storage = SQLiteStorage(ttl=1)
+    key = StorageKey(bot_id=1, chat_id=2, user_id=2)
+
+    await storage.set_state(key, 'Form:name')
+    await storage.set_data(key, {'content': [1, 2]})
+    assert await storage.get_state(key) == 'Form:name'
+    assert await storage.get_data(key) == {'content': [1, 2]}
+
+    # запись одной колонки не затирает другую, пока анкета не просрочена
+    await storage.set_state(key, 'Form:phone')
+    assert await storage.get_data(key) == {'content': [1, 2]}
+
+    await asyncio.sleep(1.2)
+    assert await storage.get_state(key) is None
+    assert await storage.get_data(key) == {}
+
+    # после истечения TTL запись state не должна вернуть старые data, и наоборот
+    await storage.set_state(key, None)
+    assert await storage.get_data(key) == {}
+    await storage.set_data(key, {'name': 'Иван'})
+    assert await storage.get_state(key) is None
+    assert await storage.get_data(key) == {'name': 'Иван'}
+
+    await models.engine.dispose()
+    print('fsm storage: ok')
+
+
+if __name__ == '__main__':
+    asyncio.run(run())
@@ -0,0 +1,147 @@
+"""
+Нагрузочный тест: N пользователей одновременно проходят анкету целиком
+(/start, action_, имя, телефон, запрос, альбом фото, send_content) через заглушку Bot API
+
+    python -m tools.loadtest -n 200 -c 50 --photos 5 --admins 5
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import tempfile
+import time
+from collections import defaultdict
+
+from tools.mock_bot_api import BOT_USER, MockBotAPI
+
+update_ids = itertools.count(1)
+message_ids = itertools.count(1)
+
+
+def percentile(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * p), len(ordered) - 1)] if ordered else 0.0
+
+
+def message_update(user_id: int, **fields) -> dict:
+    user = {'id': user_id, 'is_bot': False, 'first_name': f'user{user_id}', 'username': f'user{user_id}'}
+    message = {'message_id': next(message_ids),
+               'date': int(time.time()),
+               'chat': {'id': user_id, 'type': 'private', 'first_name': user['first_name']},
+               'from': user,
+               **fields}
+    return {'update_id': next(update_ids), 'message': message}
+
+
+def callback_update(user_id: int, data: str) -> dict:
+    user = {'id': user_id, 'is_bot': False, 'first_name': f'user{user_id}', 'username': f'user{user_id}'}
+    message = {'message_id': next(message_ids),
+               'date': int(time.time()),
+               'chat': {'id': user_id, 'type': 'private', 'first_name': user['first_name']},
+               'from': BOT_USER,
+               'text': '...'}
+    return {'update_id': next(update_ids),
+            'callback_query': {'id': str(next(update_ids)), 'from': user, 'chat_instance': str(user_id),
+                               'data': data, 'message': message}}
+
+
+def photo_update(user_id: int, group_id: str, n: int) -> dict:
+    photo = [{'file_id': f'photo_{user_id}_{n}', 'file_unique_id': f'u_{user_id}_{n}', 'width': 1280, 'height': 960}]
+    return message_update(user_id, photo=photo, media_group_id=group_id)
+
+
+async def run(users: int, concurrency: int, photos: int, admins: int, latency: float, fail_rate: float,
+              flood_limits: bool) -> None:
+    # окружение для load_config, БД - временная
+    tmp_dir = tempfile.mkdtemp(prefix='loadtest_')
+    os.environ.update(BOT_TOKEN='123456:LOADTEST', SUPPORT_ID='1', SUPPORT_USERNAME='support',
+                      ADMIN_IDS=','.join(str(i) for i in range(1, admins + 1)))
+
+    from aiogram import Bot, Dispatcher
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+
+    import database.models as models
+    from config_data.config import load_config
+    from database.lead_writer import lead_writer
+    from handlers import handler_user, other_handlers
+    from middleware.outer import FirstOuterMiddleware
+    from services.delivery import lead_delivery
+
+    models.init_engine(f'sqlite+aiosqlite:///{tmp_dir}/db.sqlite3')
+    await models.async_main()
+
+    api = MockBotAPI(latency=latency, fail_rate=fail_rate)
+    await api.start()
+    bot = Bot(token='123456:LOADTEST', session=AiohttpSession(api=TelegramAPIServer.from_base(api.base_url)))
+    dp = Dispatcher(config=load_config())
+    dp.include_router(handler_user.router)
+    dp.include_router(other_handlers.router)
+    dp.message.middleware(FirstOuterMiddleware())
+    await lead_writer.start()
+    if not flood_limits:
+        # заглушка не ограничивает частоту, без лимитов измеряется чистая стоимость рассылки
+        lead_delivery.set_limits(concurrency=admins, global_rate=1_000_000, chat_rate=1_000_000,
+                                 chat_burst=1_000_000)
+
+    latencies: dict[str, list[float]] = defaultdict(list)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def feed(step: str, update: dict) -> None:
+        started = time.perf_counter()
+        await dp.feed_raw_update(bot, update)
+        latencies[step].append(time.perf_counter() - started)
+
+    async def conversation(user_id: int) -> None:
+        async with semaphore:
+            await feed('start', message_update(user_id, text='/start',
+                                               entities=[{'type': 'bot_command', 'offset': 0, 'length': 6}]))
+            await feed('action', callback_update(user_id, 'action_sell'))
+            await feed('name', message_update(user_id, text='Иван'))
+            await feed('phone', message_update(user_id, text='+79991234567'))
+            await feed('request', message_update(user_id, text='Kia Rio 2018, 60 000 км'))
+            group_id = f'album_{user_id}'
+            await asyncio.gather(*(feed('album_item', photo_update(user_id, group_id, n)) for n in range(photos)))
+            await feed('send_content', callback_update(user_id, 'send_content'))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(conversation(100_000 + i) for i in range(users)))
+    handled = time.perf_counter() - started
+    await lead_delivery.join()
+    delivered = time.perf_counter() - started
+    await lead_writer.stop()
+
+    total_updates = sum(len(values) for values in latencies.values())
+    print(f'users: {users}, updates: {total_updates}, handled in {handled:.2f} s '
+          f'({total_updates / handled:.1f} upd/s), delivered in {delivered:.2f} s')
+    print(f'{"handler":<14}{"n":>7}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}')
+    for step, values in latencies.items():
+        print(f'{step:<14}{len(values):>7}{percentile(values, 0.5) * 1000:>10.1f}'
+              f'{percentile(values, 0.95) * 1000:>10.1f}{percentile(values, 0.99) * 1000:>10.1f}')
+    calls = sum(api.calls.values())
+    failures = sum(api.failures.values())
+    print(f'Bot API calls per lead: {calls / users:.1f}, failures per lead: {failures / users:.2f}')
+    for method, count in api.calls.most_common():
+        print(f'  {method:<22}{count:>7}  failed {api.failures[method]}')
+
+    await bot.session.close()
+    await api.stop()
+    await models.engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Replay full questionnaire conversations against a mock Bot API')
+    parser.add_argument('-n', '--users', type=int, default=100)
+    parser.add_argument('-c', '--concurrency', type=int, default=50)
+    parser.add_argument('--photos', type=int, default=5, help='photos in the album of each lead')
+    parser.add_argument('--admins', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.0, help='mock Bot API response delay, s')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='share of failed send* calls')
+    parser.add_argument('--flood-limits', action='store_true', help='keep Telegram flood limits in admin delivery')
+    args = parser.parse_args()
+    asyncio.run(run(args.users, args.concurrency, args.photos, args.admins, args.latency, args.fail_rate,
+                    args.flood_limits))
+
+
+if __name__ == '__main__':
+    main()
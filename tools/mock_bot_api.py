@@ -0,0 +1,77 @@
+"""
+Локальная заглушка Telegram Bot API для нагрузочных тестов
+"""
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import Counter
+from typing import Any, Optional
+
+from aiohttp import web
+
+BOT_USER = {'id': 123456, 'is_bot': True, 'first_name': 'MockBot', 'username': 'mock_bot'}
+
+
+class MockBotAPI:
+    """
+    Отвечает на запросы /bot<token>/<method> правдоподобными результатами и считает вызовы.
+    fail_rate - доля запросов send*, на которые возвращается ошибка 400, latency - задержка ответа
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 8081, latency: float = 0.0,
+                 fail_rate: float = 0.0) -> None:
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.calls = Counter()
+        self.failures = Counter()
+        self._message_ids = itertools.count(1)
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def base_url(self) -> str:
+        return f'http://{self.host}:{self.port}'
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host=self.host, port=self.port).start()
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def _message(self, params: dict) -> dict:
+        chat_id = int(params.get('chat_id') or 0)
+        return {'message_id': next(self._message_ids),
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'from': BOT_USER,
+                'text': params.get('text', '')}
+
+    def _result(self, method: str, params: dict) -> Any:
+        if method == 'getMe':
+            return BOT_USER
+        if method == 'sendMediaGroup':
+            return [self._message(params) for _ in json.loads(params.get('media', '[]'))]
+        if method.startswith('send') or method.startswith('edit'):
+            return self._message(params)
+        return True
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        params = dict(await request.post())
+        self.calls[method] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if method.startswith('send') and random.random() < self.fail_rate:
+            self.failures[method] += 1
+            return web.json_response({'ok': False, 'error_code': 400,
+                                      'description': 'Bad Request: injected failure'}, status=400)
+        return web.json_response({'ok': True, 'result': self._result(method, params)})
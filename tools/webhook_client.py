@@ -0,0 +1,72 @@
+"""
+Отправка синтетических апдейтов на локальный вебхук бота
+
+    python -m tools.webhook_client --url http://127.0.0.1:8080/webhook --secret SECRET -n 500 -c 50
+"""
+import argparse
+import asyncio
+import itertools
+import time
+
+from aiohttp import ClientSession
+
+update_ids = itertools.count(1)
+
+
+def make_update(user_id: int, text: str = '/start') -> dict:
+    """
+    Синтетический апдейт с текстовым сообщением из личного чата
+    :param user_id:
+    :param text:
+    :return:
+    """
+    update_id = next(update_ids)
+    user = {'id': user_id, 'is_bot': False, 'first_name': f'user{user_id}', 'username': f'user{user_id}'}
+    message = {'message_id': update_id,
+               'date': int(time.time()),
+               'chat': {'id': user_id, 'type': 'private', 'first_name': user['first_name']},
+               'from': user,
+               'text': text}
+    if text.startswith('/'):
+        message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text)}]
+    return {'update_id': update_id, 'message': message}
+
+
+async def post_updates(url: str, secret: str, count: int, concurrency: int, text: str) -> None:
+    headers = {'X-Telegram-Bot-Api-Secret-Token': secret} if secret else {}
+    semaphore = asyncio.Semaphore(concurrency)
+    statuses: dict[int, int] = {}
+    latencies: list[float] = []
+
+    async def post(session: ClientSession, user_id: int) -> None:
+        update = make_update(user_id, text)
+        async with semaphore:
+            started = time.perf_counter()
+            async with session.post(url, json=update, headers=headers) as response:
+                await response.read()
+                latencies.append(time.perf_counter() - started)
+                statuses[response.status] = statuses.get(response.status, 0) + 1
+
+    started = time.perf_counter()
+    async with ClientSession() as session:
+        await asyncio.gather(*(post(session, 10_000 + i) for i in range(count)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    print(f'updates: {count}, {count / elapsed:.1f} upd/s, statuses: {statuses}')
+    print(f'p50: {latencies[len(latencies) // 2] * 1000:.1f} ms, '
+          f'p99: {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='POST synthetic updates to the bot webhook')
+    parser.add_argument('--url', default='http://127.0.0.1:8080/webhook')
+    parser.add_argument('--secret', default='')
+    parser.add_argument('-n', '--count', type=int, default=100)
+    parser.add_argument('-c', '--concurrency', type=int, default=20)
+    parser.add_argument('--text', default='/start')
+    args = parser.parse_args()
+    asyncio.run(post_updates(args.url, args.secret, args.count, args.concurrency, args.text))
+
+
+if __name__ == '__main__':
+    main()